@@ -11,7 +11,62 @@
 #
 # See the LICENSE file for more details.
 
+import io
+import os
+import re
 import sys
+import bz2
+import csv
+import glob
+import gzip
+import hmac
+import json
+import lzma
+import time
+import functools
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_PARALLEL_CHUNK_SIZE = 8 * 1024 * 1024 # bytes of input handled by a worker at once
+_CACHE_SIZE = 65536 # distinct IPs remembered by the bytes engine
+_STREAM_READ_SIZE = 256 * 1024 # maximum bytes read at once on the streaming modes
+_FLUSH_INTERVAL = 1.0 # maximum seconds between two flushes on the streaming modes
+_POLL_INTERVAL = 0.25 # seconds between two checks of a followed file
+_CHECKPOINT_INTERVAL = 256 * 1024 * 1024 # input bytes between two checkpoints
+_CHECKPOINT_EXTENSION = ".checkpoint"
+_IPV4_MAX = 0xFFFFFFFF
+_IPV6_MAX = (1 << 128) - 1
+_IPV4_MAPPED_PREFIX = 0xFFFF # ::ffff:0:0/96
+_HEX_DIGITS = "0123456789abcdefABCDEF"
+_IP_VARIABLES = ("remote_addr",
+                 "realip_remote_addr",
+                 "proxy_protocol_addr",
+                 "http_x_forwarded_for",
+                 "proxy_add_x_forwarded_for",
+                 "http_x_real_ip",
+                 "upstream_addr")
+_RE_NGINX_VARIABLE = re.compile(r'\$(?:\{(\w+)\}|(\w+))') # $name or ${name}
+_COMBINED_HEAD = '$remote_addr - $remote_user [$time_local] "$request" $status ' # also the common format
+_STR_TOKENS = (' ', ' [', '] "', '" ')
+_BYTES_TOKENS = tuple(token.encode() for token in _STR_TOKENS)
+_MONTHS = {month: f"{i:02d}" for i, month in enumerate(("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                                                       "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), 1)}
+_RE_ADDRESS_SEPARATOR = re.compile(r'(\s*,\s*|\s+:\s+)') # "a, b" and the upstream groups "a : b"
+_CODEC_EXTENSIONS = {".gz": "gzip",
+                     ".bz2": "bz2",
+                     ".xz": "lzma",
+                     ".zst": "zstd"}
+
+# Settings of a parallel worker process
+__worker_anonymizer = None
+__worker_codec = None
+__worker_compress_level = None
+__worker_statistics = None
 
 def anonymize_ipv4(ip:str) -> str:
     parts = ip.split('.')
@@ -27,7 +82,167 @@ def anonymize_ipv6(ip:str) -> str:
 
     raise ValueError(f"Invalid IPv6 address: {ip}")
 
-def anonymize_ip(ip:str) -> str:
+class AnonymizationPolicy:
+    """
+        Precompiled rules to anonymize the IPs, without using `ipaddress` per address.
+        The addresses are written in their canonical form (RFC 5952 for IPv6), so all
+        the textual forms of an address give the same result.
+
+        ipv4_prefix:
+            Number of leading bits kept on IPv4 addresses (16 keeps "a.b.0.0").
+
+        ipv6_prefix:
+            Number of leading bits kept on IPv6 addresses (32 keeps "a:b::"). The IPv4-mapped
+            addresses (::ffff:a.b.c.d) are anonymized with the IPv4 prefix.
+
+        hash_key:
+            Pseudonymization: instead of zeros, the removed bits are filled with a keyed hash
+            (HMAC-SHA256) of the address. A client keeps the same pseudonym, and it can not be
+            reverted without the key.
+    """
+
+    def __init__(self, ipv4_prefix:int=16, ipv6_prefix:int=32, hash_key:None | bytes=None):
+
+        if not 0 <= ipv4_prefix <= 32:
+            raise ValueError(f"Invalid IPv4 prefix length: {ipv4_prefix}")
+
+        if not 0 <= ipv6_prefix <= 128:
+            raise ValueError(f"Invalid IPv6 prefix length: {ipv6_prefix}")
+
+        self.ipv4_prefix = ipv4_prefix
+        self.ipv6_prefix = ipv6_prefix
+        self.hash_key = hash_key
+
+        self.__ipv4_mask = (_IPV4_MAX << (32 - ipv4_prefix)) & _IPV4_MAX
+        self.__ipv6_mask = (_IPV6_MAX << (128 - ipv6_prefix)) & _IPV6_MAX
+
+    def __reduce__(self):
+        return self.__class__, (self.ipv4_prefix, self.ipv6_prefix, self.hash_key)
+
+    def anonymize(self, ip:str) -> str:
+        """
+            Anonymize an IPv4 or IPv6 address. Other values (ex: "-") are returned as they are.
+        """
+
+        if ':' in ip:
+            return self.anonymize_ipv6(ip)
+
+        elif '.' in ip:
+            return self.anonymize_ipv4(ip)
+
+        return ip
+
+    def anonymize_ipv4(self, ip:str) -> str:
+        value = self.__mask(self.__parse_ipv4(ip), self.__ipv4_mask, 4)
+        return self.__format_ipv4(value)
+
+    def anonymize_ipv6(self, ip:str) -> str:
+
+        value = self.__parse_ipv6(ip)
+
+        if value >> 32 == _IPV4_MAPPED_PREFIX:
+            return "::ffff:" + self.__format_ipv4(self.__mask(value & _IPV4_MAX, self.__ipv4_mask, 4))
+
+        return self.__format_ipv6(self.__mask(value, self.__ipv6_mask, 16))
+
+    def __mask(self, value:int, mask:int, size:int) -> int:
+
+        if self.hash_key is None:
+            return value & mask
+
+        digest = hmac.digest(self.hash_key, value.to_bytes(size, 'big'), 'sha256')
+        return (value & mask) | (int.from_bytes(digest[:size], 'big') & ~mask)
+
+    @staticmethod
+    def __parse_ipv4(ip:str) -> int:
+
+        parts = ip.split('.')
+
+        if len(parts) != 4:
+            raise ValueError(f"Invalid IPv4 address: {ip}")
+
+        value = 0
+        for part in parts:
+
+            if not part.isascii() or not part.isdigit() or int(part) > 255:
+                raise ValueError(f"Invalid IPv4 address: {ip}")
+
+            value = value << 8 | int(part)
+
+        return value
+
+    @classmethod
+    def __parse_ipv6(cls, ip:str) -> int:
+
+        address = ip.split('%', 1)[0] # remove the zone index: fe80::1%eth0
+
+        head, compressed, tail = address.partition('::')
+
+        if '::' in tail:
+            raise ValueError(f"Invalid IPv6 address: {ip}")
+
+        head_groups = head.split(':') if head else []
+        tail_groups = tail.split(':') if tail else []
+
+        # Embedded IPv4: ::ffff:192.0.2.1
+        last_groups = tail_groups if compressed else head_groups
+        if last_groups and '.' in last_groups[-1]:
+            ipv4 = cls.__parse_ipv4(last_groups[-1])
+            last_groups[-1:] = [f"{ipv4 >> 16:x}", f"{ipv4 & 0xFFFF:x}"]
+
+        missing = 8 - len(head_groups) - len(tail_groups)
+
+        if (compressed and missing < 1) or (not compressed and missing != 0):
+            raise ValueError(f"Invalid IPv6 address: {ip}")
+
+        value = 0
+        for group in head_groups + ['0'] * missing + tail_groups:
+
+            if not 1 <= len(group) <= 4 or group.lstrip(_HEX_DIGITS) != '':
+                raise ValueError(f"Invalid IPv6 address: {ip}")
+
+            value = value << 16 | int(group, 16)
+
+        return value
+
+    @staticmethod
+    def __format_ipv4(value:int) -> str:
+        return f"{value >> 24}.{value >> 16 & 0xFF}.{value >> 8 & 0xFF}.{value & 0xFF}"
+
+    @staticmethod
+    def __format_ipv6(value:int) -> str:
+
+        groups = [value >> shift & 0xFFFF for shift in range(112, -1, -16)]
+
+        # The longest run of zero groups (at least two) is replaced by "::"
+        best_start, best_length = 0, 0
+        run_start, run_length = 0, 0
+
+        for i, group in enumerate(groups):
+            if group == 0:
+                if run_length == 0:
+                    run_start = i
+
+                run_length += 1
+
+                if run_length > best_length:
+                    best_start, best_length = run_start, run_length
+            else:
+                run_length = 0
+
+        if best_length < 2:
+            return ':'.join(f"{group:x}" for group in groups)
+
+        head = ':'.join(f"{group:x}" for group in groups[:best_start])
+        tail = ':'.join(f"{group:x}" for group in groups[best_start + best_length:])
+
+        return f"{head}::{tail}"
+
+def anonymize_ip(ip:str, policy:None | AnonymizationPolicy=None) -> str:
+
+    if policy is not None:
+        return policy.anonymize(ip)
+
     if '.' in ip:
         return anonymize_ipv4(ip)
 
@@ -36,19 +251,1209 @@ def anonymize_ip(ip:str) -> str:
 
     return ip
 
-def anonymize_log_file(input_path:str, output_path:str):
-    with open(input_path, 'r') as input_file, open(output_path, 'w') as output_file:
-        for line in input_file:
-            fields = line.split(' ')
-            if fields:
-                fields[0] = anonymize_ip(fields[0])
-                output_file.write(' '.join(fields))
+def anonymize_line(line:str, policy:None | AnonymizationPolicy=None) -> str:
+    fields = line.split(' ')
+    if fields:
+        fields[0] = anonymize_ip(fields[0], policy)
+        return ' '.join(fields)
+
+    return line
+
+class LogFormat:
+    """
+        An nginx `log_format`, compiled once into a regular expression that locates the
+        variables holding addresses (`ip_variables`), so they are all anonymized in a
+        single match per line. The values can be lists, like X-Forwarded-For
+        ("a, b, c") or $upstream_addr ("a:80, b:80 : c:80").
+
+        When the only address is $remote_addr at the beginning of the line (ex: the
+        combined format), the engines keep their first field fast path.
+
+        The values of the variables must not contain the text that follows them in the
+        format, which nginx ensures for the quotes by escaping them. A line that does not
+        match the format is anonymized on its first field.
+    """
+
+    COMBINED = '$remote_addr - $remote_user [$time_local] "$request" $status $body_bytes_sent ' \
+               '"$http_referer" "$http_user_agent"'
+
+    def __init__(self, format_string:str=COMBINED, ip_variables:tuple[str, ...]=_IP_VARIABLES):
+
+        self.format_string = format_string
+        self.ip_variables = tuple(ip_variables)
+
+        # The line is captured as: (text)(address)(text)(address)...(text)
+        pattern = "("
+        # And to read the values: (?P<variable>...)
+        values_pattern = ""
+        variables = []
+        last_end = 0
+
+        for match in _RE_NGINX_VARIABLE.finditer(format_string):
+
+            pattern += re.escape(format_string[last_end:match.start()])
+            values_pattern += re.escape(format_string[last_end:match.start()])
+            last_end = match.end()
+
+            variable = match.group(1) or match.group(2)
+            variables.append(variable)
+
+            # nginx escapes the quotes of the values, so a quoted value ends at the next quote
+            if format_string.startswith('"', last_end):
+                value_pattern = '[^"]*'
+            else:
+                value_pattern = '.*?'
+
+            if variable in self.ip_variables:
+                pattern += f")({value_pattern})("
             else:
+                pattern += value_pattern
+
+            if variable in variables[:-1]:
+                values_pattern += value_pattern
+            else:
+                values_pattern += f"(?P<{variable}>{value_pattern})"
+
+        pattern += re.escape(format_string[last_end:]) + r"\r?\n?)\Z"
+        values_pattern += re.escape(format_string[last_end:]) + r"\r?\n?\Z"
+
+        self.variables = tuple(variables)
+
+        address_count = sum(1 for variable in variables if variable in self.ip_variables)
+        first_variable = _RE_NGINX_VARIABLE.match(format_string)
+
+        self.first_field_only = address_count == 1 and \
+                                first_variable is not None and \
+                                variables[0] == "remote_addr" and \
+                                format_string.startswith(" ", first_variable.end())
+
+        self.__pattern = re.compile(pattern, re.DOTALL)
+        self.__bytes_pattern = re.compile(pattern.encode('latin-1'), re.DOTALL)
+        self.__values_pattern = re.compile(values_pattern, re.DOTALL)
+        self.__bytes_values_pattern = re.compile(values_pattern.encode('latin-1'), re.DOTALL)
+
+    def __reduce__(self):
+        return self.__class__, (self.format_string, self.ip_variables)
+
+    def anonymize_fields(self, line:str | bytes, anonymize_value) -> None | str | bytes:
+        """
+            Replace each address variable of the line by `anonymize_value(value)`.
+            Return None if the line does not match the format.
+        """
+
+        pattern = self.__bytes_pattern if isinstance(line, bytes) else self.__pattern
+        match = pattern.match(line)
+
+        if match is None:
+            return None
+
+        pieces = list(match.groups())
+
+        for i in range(1, len(pieces), 2):
+            pieces[i] = anonymize_value(pieces[i])
+
+        return line[:0].join(pieces)
+
+    def get_values(self, line:str | bytes) -> None | dict:
+        """
+            Return the values of the variables of the line, or None if it does not match the format.
+        """
+
+        pattern = self.__bytes_values_pattern if isinstance(line, bytes) else self.__values_pattern
+        match = pattern.match(line)
+
+        if match is None:
+            return None
+
+        return match.groupdict()
+
+    @classmethod
+    def anonymize_addresses(cls, value:str, policy:None | AnonymizationPolicy=None) -> str:
+        """
+            Anonymize an address, or a list of them ("a, b" or "a:80 : b:80"). The ports
+            are kept. As the lists may come from the clients (X-Forwarded-For), the invalid
+            addresses are replaced by "-" instead of raising an error.
+        """
+        return ''.join(item if i % 2 else cls.__anonymize_address(item, policy)
+                       for i, item in enumerate(_RE_ADDRESS_SEPARATOR.split(value)))
+
+    @staticmethod
+    def __anonymize_address(address:str, policy:None | AnonymizationPolicy) -> str:
+
+        if address in ("", "-") or address.startswith("unix:"):
+            return address
+
+        try:
+            if address.startswith("["):
+                # [IPv6]:port
+                ip, _, port = address[1:].partition("]")
+                return f"[{anonymize_ip(ip, policy)}]{port}"
+
+            elif address.count(":") == 1:
+                # IPv4:port
+                ip, _, port = address.partition(":")
+                return f"{anonymize_ip(ip, policy)}:{port}"
+
+            return anonymize_ip(address, policy)
+
+        except ValueError:
+            return "-"
+
+class LogStatistics:
+    """
+        Aggregates built while the lines are anonymized, which avoids a second read of the
+        logs: requests per status code, per anonymized network (the anonymized client
+        address, ex: its /16) and per hour. The lines are read with the `log_format`
+        (None for the combined format).
+    """
+
+    def __init__(self, log_format:None | LogFormat=None):
+        self.log_format = log_format
+        self.lines = 0
+        self.unparsed = 0
+        self.statuses = Counter()
+        self.networks = Counter()
+        self.hours = Counter()
+
+        self.__combined = log_format is None or (log_format.format_string + " ").startswith(_COMBINED_HEAD)
+
+    def add_line(self, line:str | bytes):
+        """
+            Count an anonymized line.
+        """
+
+        self.lines += 1
+
+        if self.__combined:
+            values = self.__read_combined_line(line)
+        else:
+            values = self.__read_format_line(line)
+
+        if values is None:
+            self.unparsed += 1
+            return
+
+        network, hour, status = values
+
+        if network is not None:
+            self.networks[network] += 1
+
+        if hour is not None:
+            self.hours[hour] += 1
+
+        if status is not None:
+            self.statuses[status] += 1
+
+    def merge(self, other:"LogStatistics"):
+        """
+            Add the aggregates of another instance (ex: from a worker process).
+        """
+        self.lines += other.lines
+        self.unparsed += other.unparsed
+        self.statuses.update(other.statuses)
+        self.networks.update(other.networks)
+        self.hours.update(other.hours)
+
+    def to_dict(self) -> dict:
+        return {"lines": self.lines,
+                "unparsed": self.unparsed,
+                "status": self.__sorted_counts(self.statuses),
+                "networks": self.__sorted_counts(self.networks),
+                "hours": self.__sorted_counts(self.hours, self.__format_hour)}
+
+    @classmethod
+    def from_dict(cls, data:dict, log_format:None | LogFormat=None) -> "LogStatistics":
+        statistics = cls(log_format)
+        statistics.lines = data["lines"]
+        statistics.unparsed = data["unparsed"]
+        statistics.statuses.update(data["status"])
+        statistics.networks.update(data["networks"])
+        statistics.hours.update(data["hours"])
+        return statistics
+
+    def write(self, path:str):
+        """
+            Write the aggregates as CSV (for a .csv path) or JSON.
+        """
+
+        data = self.to_dict()
+
+        with open(path, 'w', newline='') as f:
+
+            if not path.lower().endswith(".csv"):
+                json.dump(data, f, indent=4)
+                return
+
+            writer = csv.writer(f)
+            writer.writerow(("aggregate", "key", "requests"))
+            writer.writerow(("lines", "", data["lines"]))
+            writer.writerow(("unparsed", "", data["unparsed"]))
+
+            for aggregate in ("status", "networks", "hours"):
+                for key, count in data[aggregate].items():
+                    writer.writerow((aggregate, key, count))
+
+    @staticmethod
+    def __read_combined_line(line:str | bytes) -> None | tuple:
+        """
+            $remote_addr - $remote_user [$time_local] "$request" $status ...
+        """
+
+        space, time_start, request_start, request_end = _STR_TOKENS if isinstance(line, str) else _BYTES_TOKENS
+
+        network_end = line.find(space)
+        if network_end < 0:
+            return None
+
+        time_index = line.find(time_start, network_end)
+        if time_index < 0:
+            return None
+
+        request_index = line.find(request_start, time_index)
+        if request_index < 0:
+            return None
+
+        request_end_index = line.find(request_end, request_index + 3)
+        if request_end_index < 0:
+            return None
+
+        status_start = request_end_index + 2
+        status_end = line.find(space, status_start)
+
+        if status_end < 0:
+            status = line[status_start:].strip()
+        else:
+            status = line[status_start:status_end]
+
+        return line[:network_end], line[time_index + 2:time_index + 16], status # 10/Oct/2000:13
+
+    def __read_format_line(self, line:str | bytes) -> None | tuple:
+
+        values = self.log_format.get_values(line)
+
+        if values is None:
+            return None
+
+        if values.get("time_local") is not None:
+            hour = values["time_local"][:14] # 10/Oct/2000:13
+        elif values.get("time_iso8601") is not None:
+            hour = values["time_iso8601"][:13] # 2000-10-10T13
+        else:
+            hour = None
+
+        return values.get("remote_addr"), hour, values.get("status")
+
+    @staticmethod
+    def __format_hour(hour:str) -> str:
+        """
+            Write the $time_local hours like the $time_iso8601 ones (10/Oct/2000:13 -> 2000-10-10T13).
+        """
+
+        if len(hour) == 14 and hour[2] == "/" and hour[3:6] in _MONTHS:
+            return f"{hour[7:11]}-{_MONTHS[hour[3:6]]}-{hour[:2]}T{hour[12:14]}"
+
+        return hour
+
+    @staticmethod
+    def __sorted_counts(counter:Counter, format_key=None) -> dict:
+        """
+            Decode the keys (the bytes engine counts bytes) and sort them.
+        """
+
+        counts = Counter()
+
+        for key, count in counter.items():
+
+            if isinstance(key, bytes):
+                key = key.decode('latin-1')
+
+            if format_key is not None:
+                key = format_key(key)
+
+            counts[key] += count
+
+        return dict(sorted(counts.items()))
+
+class LineAnonymizer:
+    """
+        Base of the engines. It holds the settings that are sent to the worker processes,
+        and the cache counters that are merged back from them.
+
+        log_format:
+            Anonymize the addresses of these fields, instead of the first field only.
+    """
+
+    def __init__(self, policy:None | AnonymizationPolicy=None, log_format:None | LogFormat=None):
+        self.policy = policy
+        self.log_format = log_format
+        self._merged_hits = 0
+        self._merged_misses = 0
+
+        # Whether the lines must be matched against the log format
+        self._match_fields = log_format is not None and not log_format.first_field_only
+
+    @property
+    def hits(self) -> int:
+        return self._merged_hits
+
+    @property
+    def misses(self) -> int:
+        return self._merged_misses
+
+    def merge_counters(self, hits:int, misses:int):
+        """
+            Add the counters of another anonymizer (ex: from a worker process).
+        """
+        self._merged_hits += hits
+        self._merged_misses += misses
+
+class TextAnonymizer(LineAnonymizer):
+    """
+        The default engine: the lines are decoded, and their first field is anonymized
+        (or the fields of the log format).
+    """
+
+    def __reduce__(self):
+        return self.__class__, (self.policy, self.log_format)
+
+    def anonymize_line(self, line:str) -> str:
+
+        if self._match_fields:
+            anonymized_line = self.log_format.anonymize_fields(line, self.__anonymize_addresses)
+
+            if anonymized_line is not None:
+                return anonymized_line
+
+        return anonymize_line(line, self.policy)
+
+    def __anonymize_addresses(self, value:str) -> str:
+        return LogFormat.anonymize_addresses(value, self.policy)
+
+class BytesAnonymizer(LineAnonymizer):
+    """
+        Anonymize the lines without decoding them: only the prefix up to the first
+        space (or the fields of the log format) is processed, and the rest of the line
+        is copied as it is. Unlike the text mode, the new lines are not translated
+        (Windows new lines are kept).
+
+        The anonymized values are kept on a LRU cache, because the same clients
+        are repeated many times in a log. Its counters are available with `hits`
+        and `misses`.
+    """
+
+    def __init__(self,
+                 cache_size:int=_CACHE_SIZE,
+                 policy:None | AnonymizationPolicy=None,
+                 log_format:None | LogFormat=None):
+        super().__init__(policy, log_format)
+        self.cache_size = cache_size
+        self.__anonymize_prefix = functools.lru_cache(maxsize=cache_size)(self.__anonymize_ip)
+        self.__anonymize_field = functools.lru_cache(maxsize=cache_size)(self.__anonymize_addresses)
+
+    def __reduce__(self):
+        # Only the configuration is sent to the worker processes, not the cache
+        return self.__class__, (self.cache_size, self.policy, self.log_format)
+
+    @property
+    def hits(self) -> int:
+        return self.__anonymize_prefix.cache_info().hits + \
+               self.__anonymize_field.cache_info().hits + \
+               self._merged_hits
+
+    @property
+    def misses(self) -> int:
+        return self.__anonymize_prefix.cache_info().misses + \
+               self.__anonymize_field.cache_info().misses + \
+               self._merged_misses
+
+    def anonymize_line(self, line:bytes) -> bytes:
+
+        if self._match_fields:
+            anonymized_line = self.log_format.anonymize_fields(line, self.__anonymize_field)
+
+            if anonymized_line is not None:
+                return anonymized_line
+
+        index = line.find(b' ')
+
+        if index == -1:
+            return self.__anonymize_prefix(line)
+
+        return self.__anonymize_prefix(line[:index]) + line[index:]
+
+    def __anonymize_ip(self, ip:bytes) -> bytes:
+        return anonymize_ip(ip.decode('latin-1'), self.policy).encode('latin-1')
+
+    def __anonymize_addresses(self, value:bytes) -> bytes:
+        return LogFormat.anonymize_addresses(value.decode('latin-1'), self.policy).encode('latin-1')
+
+def open_log_file(path:str, mode:str, compress_level:None | int=None):
+    """
+        Open a log file like `open`, (de)compressing it according to its extension:
+        .gz, .bz2, .xz and .zst (if the zstandard module is installed).
+
+        compress_level:
+            Compression level used when writing, None for the codec default.
+    """
+
+    codec = get_codec(path)
+
+    if codec is None:
+        return open(path, mode)
+
+    text_mode = 'b' not in mode
+    binary_mode = mode.replace('t', '').replace('b', '') + 'b'
+    writing = binary_mode != 'rb'
+
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError(f"The zstandard module is required to open: {path}")
+
+        if writing:
+            cctx = zstandard.ZstdCompressor(**__get_level_kwargs(codec, compress_level))
+            log_file = cctx.stream_writer(open(path, binary_mode), closefd=True)
+        else:
+            # read_across_frames, because the parallel mode writes one frame per chunk
+            dctx = zstandard.ZstdDecompressor()
+            log_file = io.BufferedReader(dctx.stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True))
+
+        return io.TextIOWrapper(log_file) if text_mode else log_file
+
+    kwargs = __get_level_kwargs(codec, compress_level) if writing else {}
+    binary_file = {"gzip": gzip.open, "bz2": bz2.open, "lzma": lzma.open}[codec](path, binary_mode, **kwargs)
+
+    return io.TextIOWrapper(binary_file) if text_mode else binary_file
+
+def get_codec(path:str) -> None | str:
+    """
+        Return the name of the compression codec of the path, or None for plain files.
+    """
+    return _CODEC_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+def __get_level_kwargs(codec:str, compress_level:None | int) -> dict:
+
+    if compress_level is None:
+        return {}
+
+    return {"gzip": {"compresslevel": compress_level},
+            "bz2": {"compresslevel": compress_level},
+            "lzma": {"preset": compress_level},
+            "zstd": {"level": compress_level}}[codec]
+
+def __compress(data:bytes, codec:None | str, compress_level:None | int) -> bytes:
+    """
+        Compress the data as an independent member (gzip, bz2) or stream/frame (xz, zstd).
+        The decompressors read the concatenated members as a single stream.
+    """
+
+    if codec is None:
+        return data
+
+    kwargs = __get_level_kwargs(codec, compress_level)
+
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(**kwargs).compress(data)
+
+    return {"gzip": gzip.compress, "bz2": bz2.compress, "lzma": lzma.compress}[codec](data, **kwargs)
+
+def anonymize_log_file(input_path:str,
+                       output_path:str,
+                       workers:int=1,
+                       anonymizer:None | LineAnonymizer=None,
+                       compress_level:None | int=None,
+                       checkpoint_interval:None | int=None,
+                       resume:bool=False,
+                       statistics_path:None | str=None):
+    """
+        The input and output files are (de)compressed according to their extension,
+        see `open_log_file`.
+
+        workers:
+            Number of processes used to anonymize the file. With more than one worker,
+            the input is split into chunks aligned to the line boundaries, and the chunks
+            are written back in their original order, so the output is identical to the
+            one of a single worker. When the output is compressed, each chunk is compressed
+            by the workers as an independent member: the decompressed data is identical,
+            but not the compressed bytes.
+
+        anonymizer:
+            The engine and its policy, None for a default `TextAnonymizer`. When several
+            workers are used, the counters of their caches are merged into this anonymizer.
+
+        compress_level:
+            Compression level of the output, None for the codec default.
+
+        checkpoint_interval:
+            Every time that this number of input bytes is processed, the input offset and
+            the output size are saved in the "output_path.checkpoint" sidecar. It is removed
+            once the file is completed. Only for uncompressed files.
+
+        resume:
+            Restart from the last checkpoint (if any): the output is truncated to the saved
+            size and the input is read from the saved offset. It enables the checkpoints.
+
+        statistics_path:
+            Write the `LogStatistics` of the anonymized lines in this JSON (or .csv) file.
+    """
+
+    if workers < 1:
+        raise ValueError(f"Invalid number of workers: {workers}")
+
+    if anonymizer is None:
+        anonymizer = TextAnonymizer()
+
+    statistics = None if statistics_path is None else LogStatistics(anonymizer.log_format)
+
+    if checkpoint_interval is not None or resume:
+        __anonymize_log_file_resumable(input_path,
+                                       output_path,
+                                       workers,
+                                       anonymizer,
+                                       _CHECKPOINT_INTERVAL if checkpoint_interval is None else checkpoint_interval,
+                                       resume,
+                                       statistics)
+
+    elif workers > 1:
+        __anonymize_log_file_parallel(input_path, output_path, workers, anonymizer, compress_level, statistics)
+
+    else:
+        binary = isinstance(anonymizer, BytesAnonymizer)
+
+        with open_log_file(input_path, 'rb' if binary else 'r') as input_file, \
+             open_log_file(output_path, 'wb' if binary else 'w', compress_level) as output_file:
+            for line in input_file:
+                line = anonymizer.anonymize_line(line)
                 output_file.write(line)
 
+                if statistics is not None:
+                    statistics.add_line(line)
+
+    if statistics is not None:
+        statistics.write(statistics_path)
+
+def __anonymize_log_file_parallel(input_path:str,
+                                  output_path:str,
+                                  workers:int,
+                                  anonymizer:LineAnonymizer,
+                                  compress_level:None | int,
+                                  statistics:None | LogStatistics):
+
+    output_codec = get_codec(output_path)
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=__init_worker,
+                             initargs=(anonymizer, output_codec, compress_level, statistics)) as executor, \
+         open(output_path, 'wb') as output_file:
+
+        if get_codec(input_path) is None:
+            # The workers read their own range of the file
+            tasks = ((__anonymize_file_range, input_path, start, end)
+                     for start, end in __split_file_ranges(input_path, _PARALLEL_CHUNK_SIZE))
+        else:
+            # A compressed file can not be seeked, so it is decompressed here
+            tasks = ((__anonymize_data, data)
+                     for data in __read_chunks(input_path, _PARALLEL_CHUNK_SIZE))
+
+        written = False
+
+        for data, hits, misses, chunk_statistics in __imap_ordered(executor, workers, tasks):
+            output_file.write(data)
+            written = True
+            anonymizer.merge_counters(hits, misses)
+
+            if statistics is not None:
+                statistics.merge(chunk_statistics)
+
+        if not written and output_codec is not None:
+            # An empty but valid compressed file
+            output_file.write(__compress(b'', output_codec, compress_level))
+
+def __anonymize_log_file_resumable(input_path:str,
+                                   output_path:str,
+                                   workers:int,
+                                   anonymizer:LineAnonymizer,
+                                   checkpoint_interval:int,
+                                   resume:bool,
+                                   statistics:None | LogStatistics):
+
+    if get_codec(input_path) is not None or get_codec(output_path) is not None:
+        raise ValueError("The checkpoints can only be used with uncompressed files")
+
+    if checkpoint_interval < 1:
+        raise ValueError(f"Invalid checkpoint interval: {checkpoint_interval}")
+
+    checkpoint_path = output_path + _CHECKPOINT_EXTENSION
+    input_stat = os.stat(input_path)
+    input_offset = 0
+    output_size = 0
+
+    if resume and os.path.exists(checkpoint_path):
+
+        with open(checkpoint_path, 'r') as f:
+            checkpoint = json.load(f)
+
+        if checkpoint["input_size"] != input_stat.st_size or \
+           checkpoint["input_mtime_ns"] != input_stat.st_mtime_ns:
+            raise ValueError(f"The input file has changed since the checkpoint: {checkpoint_path}")
+
+        if not os.path.exists(output_path) or os.path.getsize(output_path) < checkpoint["output_size"]:
+            raise ValueError(f"The output file is shorter than the checkpoint: {checkpoint_path}")
+
+        input_offset = checkpoint["input_offset"]
+        output_size = checkpoint["output_size"]
+
+        if statistics is not None:
+            if checkpoint.get("statistics") is None:
+                raise ValueError(f"The checkpoint does not contain statistics: {checkpoint_path}")
+
+            statistics.merge(LogStatistics.from_dict(checkpoint["statistics"]))
+
+    # Small ranges, so the last checkpoint is close to the interval
+    ranges = __split_file_ranges(input_path, min(_PARALLEL_CHUNK_SIZE, checkpoint_interval), input_offset)
+
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       initializer=__init_worker,
+                                       initargs=(anonymizer, None, None, statistics))
+        tasks = ((__anonymize_file_range, input_path, start, end) for start, end in ranges)
+        results = __imap_ordered(executor, workers, tasks)
+    else:
+        executor = None
+        results = ((__anonymize_chunk(__read_file_range(input_path, start, end), anonymizer, statistics), 0, 0, None)
+                   for start, end in ranges)
+
+    try:
+        with open(output_path, 'r+b' if output_size > 0 else 'wb') as output_file:
+
+            # Remove what was written after the checkpoint
+            output_file.truncate(output_size)
+            output_file.seek(output_size)
+
+            last_checkpoint = input_offset
+
+            for (_, end), (data, hits, misses, chunk_statistics) in zip(ranges, results):
+                output_file.write(data)
+                anonymizer.merge_counters(hits, misses)
+
+                if chunk_statistics is not None:
+                    statistics.merge(chunk_statistics)
+
+                if end - last_checkpoint >= checkpoint_interval:
+                    # The output must be on the disk before the checkpoint points to it
+                    output_file.flush()
+                    os.fsync(output_file.fileno())
+                    __write_checkpoint(checkpoint_path, input_stat, end, output_file.tell(), statistics)
+                    last_checkpoint = end
+
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+def __write_checkpoint(checkpoint_path:str,
+                       input_stat:os.stat_result,
+                       input_offset:int,
+                       output_size:int,
+                       statistics:None | LogStatistics):
+    """
+        Replace the checkpoint atomically, so a crash never leaves a partial one.
+    """
+
+    temp_path = checkpoint_path + ".tmp"
+
+    with open(temp_path, 'w') as f:
+        json.dump({"input_size": input_stat.st_size,
+                   "input_mtime_ns": input_stat.st_mtime_ns,
+                   "input_offset": input_offset,
+                   "output_size": output_size,
+                   "statistics": None if statistics is None else statistics.to_dict()}, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temp_path, checkpoint_path)
+
+def __imap_ordered(executor:ProcessPoolExecutor, workers:int, tasks):
+    """
+        Yield the results of the (function, *args) tasks in their original order. A bounded
+        number of tasks is kept in flight, so the memory does not grow with the file size.
+    """
+
+    pending = deque()
+
+    for task in tasks:
+        pending.append(executor.submit(*task))
+
+        if len(pending) >= workers * 2:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+def __init_worker(anonymizer:LineAnonymizer,
+                  output_codec:None | str,
+                  compress_level:None | int,
+                  statistics:None | LogStatistics):
+    global __worker_anonymizer, __worker_codec, __worker_compress_level, __worker_statistics
+    __worker_anonymizer = anonymizer
+    __worker_codec = output_codec
+    __worker_compress_level = compress_level
+    __worker_statistics = statistics
+
+def __read_chunks(input_path:str, chunk_size:int):
+    """
+        Yield chunks of (decompressed) data, ending at a line boundary.
+    """
+
+    with open_log_file(input_path, 'rb') as input_file:
+        while True:
+            data = input_file.read(chunk_size)
+
+            if not data:
+                break
+
+            if not data.endswith(b'\n'):
+                data += input_file.readline()
+
+            yield data
+
+def __split_file_ranges(input_path:str, chunk_size:int, start:int=0) -> list[tuple[int, int]]:
+    """
+        Return the [start, end) byte ranges of the file. Every range ends right after
+        a new line (or at the end of the file), so no line is shared by two ranges.
+    """
+
+    file_size = os.path.getsize(input_path)
+    ranges = []
+
+    with open(input_path, 'rb') as input_file:
+
+        while start < file_size:
+
+            end = start + chunk_size
+
+            if end >= file_size:
+                end = file_size
+            else:
+                input_file.seek(end - 1)
+                input_file.readline()
+                end = input_file.tell()
+
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+def __read_file_range(input_path:str, start:int, end:int) -> bytes:
+
+    with open(input_path, 'rb') as input_file:
+        input_file.seek(start)
+        return input_file.read(end - start)
+
+def __anonymize_file_range(input_path:str, start:int, end:int) -> tuple[bytes, int, int, None | LogStatistics]:
+    """
+        Executed by the workers, see `__anonymize_data`.
+    """
+    return __anonymize_data(__read_file_range(input_path, start, end))
+
+def __anonymize_data(data:bytes) -> tuple[bytes, int, int, None | LogStatistics]:
+    """
+        Executed by the workers, see `__anonymize_chunk`.
+
+        Return the anonymized (and compressed) data, the cache hits & misses, and
+        the statistics of the chunk (None when they are disabled).
+    """
+
+    hits = __worker_anonymizer.hits
+    misses = __worker_anonymizer.misses
+    statistics = None if __worker_statistics is None else LogStatistics(__worker_statistics.log_format)
+
+    data = __anonymize_chunk(data, __worker_anonymizer, statistics)
+
+    return (__compress(data, __worker_codec, __worker_compress_level),
+            __worker_anonymizer.hits - hits,
+            __worker_anonymizer.misses - misses,
+            statistics)
+
+def __anonymize_chunk(data:bytes, anonymizer:LineAnonymizer, statistics:None | LogStatistics=None) -> bytes:
+    """
+        Anonymize complete lines. With the text engine, the data is decoded and encoded
+        like the serial mode does (same encoding and new line translation), to produce
+        the same output.
+
+        The anonymized lines are added to `statistics` if it is not None.
+    """
+
+    if isinstance(anonymizer, TextAnonymizer):
+        with io.TextIOWrapper(io.BytesIO(data)) as text_file:
+            lines = [anonymizer.anonymize_line(line) for line in text_file]
+            encoding = text_file.encoding
+    else:
+        lines = [anonymizer.anonymize_line(line) for line in io.BytesIO(data)]
+        encoding = None
+
+    if statistics is not None:
+        for line in lines:
+            statistics.add_line(line)
+
+    return b''.join(lines) if encoding is None else ''.join(lines).encode(encoding)
+
+def anonymize_directory(input_pattern:str,
+                        output_dir:str,
+                        workers:None | int=None,
+                        anonymizer:None | LineAnonymizer=None,
+                        compress_level:None | int=None,
+                        force:bool=False,
+                        verbose:bool=True) -> list[tuple[str, int, float]]:
+    """
+        Anonymize many files in a single process, with a pool of `workers` processes
+        (one file per worker, None for all the CPUs). Each output is written in
+        `output_dir` with the name of its input.
+
+        input_pattern:
+            A directory (all the files inside it) or a glob pattern, ex: "/var/log/nginx/*.gz"
+
+        force:
+            Anonymize all the files. Otherwise, the files whose output is newer than the
+            input are skipped.
+
+        Return the (input path, input bytes, seconds) of the anonymized files.
+    """
+
+    if anonymizer is None:
+        anonymizer = TextAnonymizer()
+
+    if os.path.isdir(input_pattern):
+        input_pattern = os.path.join(glob.escape(input_pattern), "*")
+
+    if not os.path.isdir(output_dir):
+        raise ValueError(f"The output directory does not exist: {output_dir}")
+
+    jobs = []
+    skipped = 0
+
+    for input_path in sorted(glob.glob(input_pattern)):
+
+        if not os.path.isfile(input_path):
+            continue
+
+        output_path = os.path.join(output_dir, os.path.basename(input_path))
+
+        if os.path.abspath(output_path) == os.path.abspath(input_path):
+            raise ValueError(f"The output would overwrite the input: {input_path}")
+
+        if not force and os.path.exists(output_path) and \
+           os.path.getmtime(output_path) >= os.path.getmtime(input_path):
+            if verbose:
+                print(f" skipped (up to date)\t{input_path}")
+            skipped += 1
+            continue
+
+        jobs.append((input_path, output_path))
+
+    results = []
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+
+        futures = [executor.submit(__anonymize_batch_file, input_path, output_path, anonymizer, compress_level)
+                   for input_path, output_path in jobs]
+
+        for future in as_completed(futures):
+            input_path, input_size, seconds, hits, misses = future.result()
+            results.append((input_path, input_size, seconds))
+            anonymizer.merge_counters(hits, misses)
+
+            if verbose:
+                print(f" {__format_speed(input_size, seconds)}\t{input_path}")
+
+    total_seconds = time.perf_counter() - start_time
+    total_size = sum(input_size for _, input_size, _ in results)
+
+    if verbose:
+        print(f"\n {len(results)} files anonymized, {skipped} skipped: "
+              f"{__format_speed(total_size, total_seconds)} in total")
+
+    return results
+
+def __anonymize_batch_file(input_path:str,
+                           output_path:str,
+                           anonymizer:LineAnonymizer,
+                           compress_level:None | int) -> tuple[str, int, float, int, int]:
+    """
+        Executed by the workers of `anonymize_directory`.
+    """
+
+    start_time = time.perf_counter()
+    anonymize_log_file(input_path, output_path, anonymizer=anonymizer, compress_level=compress_level)
+    seconds = time.perf_counter() - start_time
+
+    return input_path, os.path.getsize(input_path), seconds, anonymizer.hits, anonymizer.misses
+
+def __format_speed(size:int, seconds:float) -> str:
+    megabytes = size / (1024 * 1024)
+    return f"{megabytes:.1f} MB in {seconds:.2f} s ({megabytes / max(seconds, 1e-9):.1f} MB/s)"
+
+def anonymize_stream(input_file,
+                     output_file,
+                     anonymizer:None | LineAnonymizer=None,
+                     flush_interval:float=_FLUSH_INTERVAL):
+    """
+        Anonymize a binary stream (ex: stdin, a FIFO) into another one (ex: stdout),
+        until the end of the input.
+
+        The input is read by blocks of the available data, so a burst is processed
+        with a few large reads. The output is flushed each time that the input is
+        drained, so a single line is not delayed, and at least every `flush_interval`
+        seconds under a continuous load.
+    """
+
+    if anonymizer is None:
+        anonymizer = TextAnonymizer()
+
+    pending = b''
+    last_flush = time.monotonic()
+
+    while True:
+        data = input_file.read1(_STREAM_READ_SIZE)
+
+        if not data:
+            break
+
+        pending = __write_lines(pending + data, output_file, anonymizer)
+
+        now = time.monotonic()
+        if len(data) < _STREAM_READ_SIZE or now - last_flush >= flush_interval:
+            output_file.flush()
+            last_flush = now
+
+    if pending:
+        # Last line without a new line
+        output_file.write(__anonymize_chunk(pending, anonymizer))
+
+    output_file.flush()
+
+def follow_log_file(input_path:str,
+                    output_file,
+                    anonymizer:None | LineAnonymizer=None,
+                    flush_interval:float=_FLUSH_INTERVAL,
+                    poll_interval:float=_POLL_INTERVAL):
+    """
+        Like `tail -F`: anonymize the file into the binary `output_file`, then wait for
+        new lines until interrupted. The file is reopened when it is rotated (the path
+        points to a new inode) and read from the beginning when it is truncated.
+    """
+
+    if anonymizer is None:
+        anonymizer = TextAnonymizer()
+
+    input_file = open(input_path, 'rb')
+    pending = b''
+    last_flush = time.monotonic()
+
+    try:
+        while True:
+            data = input_file.read1(_STREAM_READ_SIZE)
+
+            if data:
+                pending = __write_lines(pending + data, output_file, anonymizer)
+
+                now = time.monotonic()
+                if now - last_flush >= flush_interval:
+                    output_file.flush()
+                    last_flush = now
+
+                continue
+
+            #
+            # End of the file: flush and look for a rotation
+            #
+            output_file.flush()
+            last_flush = time.monotonic()
+
+            try:
+                path_stat = os.stat(input_path)
+            except FileNotFoundError:
+                # Rotated but not created yet
+                time.sleep(poll_interval)
+                continue
+
+            if path_stat.st_ino != os.fstat(input_file.fileno()).st_ino:
+
+                # The lines written to the old file before its rotation, after the last read
+                while data := input_file.read1(_STREAM_READ_SIZE):
+                    pending = __write_lines(pending + data, output_file, anonymizer)
+
+                # The last line of the old file, ended so it is not joined to the new file
+                if pending:
+                    output_file.write(__anonymize_chunk(pending + b'\n', anonymizer))
+                    pending = b''
+
+                input_file.close()
+                input_file = open(input_path, 'rb')
+
+            elif path_stat.st_size < input_file.tell():
+                input_file.seek(0)
+                pending = b''
+
+            else:
+                time.sleep(poll_interval)
+
+    finally:
+        input_file.close()
+
+def __write_lines(data:bytes, output_file, anonymizer:LineAnonymizer) -> bytes:
+    """
+        Write the complete lines of the data, and return the remaining partial line.
+    """
+
+    end = data.rfind(b'\n') + 1
+
+    if end > 0:
+        output_file.write(__anonymize_chunk(data[:end], anonymizer))
+
+    return data[end:]
+
+def __pop_flag(args:list[str], name:str) -> bool:
+
+    if name not in args:
+        return False
+
+    args.remove(name)
+
+    return True
+
+def pop_option(args:list[str], name:str, default:None | int | float | str, cast=int) -> None | int | float | str:
+    """
+        Remove the option and its value from the command line arguments, and return
+        the value converted with `cast` (the default if the option is not given).
+        Also used by benchmark_anonymize.py.
+    """
+
+    if name not in args:
+        return default
+
+    index = args.index(name)
+
+    try:
+        value = cast(args[index + 1])
+    except (IndexError, ValueError):
+        print(f"Error: {name} requires a value of type {cast.__name__}")
+        sys.exit(1)
+
+    del args[index:index + 2]
+
+    return value
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python anonymize_nginx_log_simple.py input.log output.log")
+
+    arguments = sys.argv[1:]
+    workers_nb = pop_option(arguments, "--workers", None)
+    bytes_engine = __pop_flag(arguments, "--bytes")
+    cache_size = pop_option(arguments, "--cache-size", _CACHE_SIZE)
+    level = pop_option(arguments, "--level", None)
+    follow = __pop_flag(arguments, "--follow")
+    flush_seconds = pop_option(arguments, "--flush-interval", _FLUSH_INTERVAL, float)
+    checkpoint_mb = pop_option(arguments, "--checkpoint", None)
+    resume_run = __pop_flag(arguments, "--resume")
+    batch = __pop_flag(arguments, "--batch")
+    force_batch = __pop_flag(arguments, "--force")
+    ipv4_prefix_len = pop_option(arguments, "--ipv4-prefix", None)
+    ipv6_prefix_len = pop_option(arguments, "--ipv6-prefix", None)
+    hash_key_path = pop_option(arguments, "--hash-key-file", None, str)
+    log_format_string = pop_option(arguments, "--log-format", None, str)
+    ip_variable_names = pop_option(arguments, "--ip-variables", None, str)
+    stats_path = pop_option(arguments, "--stats", None, str)
+
+    if len(arguments) != 2 or (workers_nb is not None and workers_nb < 1):
+        print("Usage: python anonymize_access.py input.log[.gz|.bz2|.xz|.zst] output.log[.gz|.bz2|.xz|.zst] "
+              "[--workers N] [--bytes [--cache-size N]] [--level N] [--checkpoint MB] [--resume] [--stats stats.json|stats.csv]")
+        print("       python anonymize_access.py -|input.log -|output.log [--follow] [--flush-interval S] "
+              "[--bytes [--cache-size N]] [--level N]")
+        print("       python anonymize_access.py --batch input_dir|'input_glob' output_dir "
+              "[--workers N] [--bytes [--cache-size N]] [--level N] [--force]")
+        print("\nPolicy options: [--ipv4-prefix BITS] [--ipv6-prefix BITS] [--hash-key-file PATH]")
+        print("Field options: [--log-format 'nginx log_format'] [--ip-variables remote_addr,http_x_forwarded_for,...]")
+        print("Use - to read from stdin or write to stdout.")
         sys.exit(1)
 
-    anonymize_log_file(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    input_arg, output_arg = arguments
+
+    if stats_path is not None and (batch or follow or "-" in (input_arg, output_arg)):
+        print("Error: --stats requires an input file and an output file")
+        sys.exit(1)
+
+    if ipv4_prefix_len is None and ipv6_prefix_len is None and hash_key_path is None:
+        ip_policy = None
+    else:
+        if hash_key_path is None:
+            key = None
+        else:
+            with open(hash_key_path, 'rb') as key_file:
+                key = key_file.read().strip()
+
+        ip_policy = AnonymizationPolicy(ipv4_prefix=16 if ipv4_prefix_len is None else ipv4_prefix_len,
+                                        ipv6_prefix=32 if ipv6_prefix_len is None else ipv6_prefix_len,
+                                        hash_key=key)
+
+    if log_format_string is None and ip_variable_names is None:
+        nginx_format = None
+    else:
+        nginx_format = LogFormat(LogFormat.COMBINED if log_format_string is None else log_format_string,
+                                 _IP_VARIABLES if ip_variable_names is None else ip_variable_names.split(","))
+
+    if bytes_engine:
+        line_anonymizer = BytesAnonymizer(cache_size, ip_policy, nginx_format)
+    else:
+        line_anonymizer = TextAnonymizer(ip_policy, nginx_format)
+
+    if batch:
+        anonymize_directory(input_arg,
+                            output_arg,
+                            workers=workers_nb,
+                            anonymizer=line_anonymizer,
+                            compress_level=level,
+                            force=force_batch)
+
+    elif follow or "-" in (input_arg, output_arg):
+
+        if follow and input_arg == "-":
+            print("Error: --follow requires an input file")
+            sys.exit(1)
+
+        if output_arg == "-":
+            output_stream = sys.stdout.buffer
+        else:
+            output_stream = open_log_file(output_arg, 'wb', level)
+
+        try:
+            if follow:
+                follow_log_file(input_arg, output_stream, line_anonymizer, flush_seconds)
+
+            elif input_arg == "-":
+                anonymize_stream(sys.stdin.buffer, output_stream, line_anonymizer, flush_seconds)
+
+            else:
+                with open_log_file(input_arg, 'rb') as input_stream:
+                    anonymize_stream(input_stream, output_stream, line_anonymizer, flush_seconds)
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            if output_stream is not sys.stdout.buffer:
+                output_stream.close()
+
+    else:
+        anonymize_log_file(input_arg,
+                           output_arg,
+                           workers=1 if workers_nb is None else workers_nb,
+                           anonymizer=line_anonymizer,
+                           compress_level=level,
+                           checkpoint_interval=None if checkpoint_mb is None else checkpoint_mb * 1024 * 1024,
+                           resume=resume_run,
+                           statistics_path=stats_path)
+
+    if bytes_engine:
+        print(f"IP cache: hits={line_anonymizer.hits} misses={line_anonymizer.misses}", file=sys.stderr)
@@ -0,0 +1,240 @@
+#!/usr/bin/python3
+
+#
+# Copyright (c) 2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+import os
+import sys
+import json
+import time
+import random
+import resource
+import tempfile
+import multiprocessing
+from typing import Literal
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nginx.anonymize_access import anonymize_log_file, pop_option, TextAnonymizer, BytesAnonymizer
+
+_ENGINES = ("text", "bytes", "text-parallel", "bytes-parallel")
+_SEED = 2025 # the same seed always generates the same log
+_DISTINCT_IPS = 50000 # clients of the synthetic log
+_STATUSES = (200, 200, 200, 200, 301, 304, 404, 404, 500)
+_METHODS = ("GET", "GET", "GET", "POST", "HEAD")
+_PATHS = ("/", "/index.html", "/static/app.js", "/static/style.css", "/api/v1/items", "/login", "/favicon.ico")
+_USER_AGENTS = ("Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0",
+                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+                "curl/8.5.0",
+                "-")
+
+def generate_log(path:str,
+                 size:int,
+                 ipv6_ratio:float=0.2,
+                 distinct_ips:int=_DISTINCT_IPS,
+                 seed:int=_SEED) -> int:
+    """
+        Write a synthetic access log of the combined format, of about `size` bytes
+        (the last line is complete). The content only depends on the arguments.
+
+        ipv6_ratio:
+            Part of the clients with an IPv6 address, between 0 and 1.
+
+        distinct_ips:
+            Number of clients, which sets the cache hit rate of the bytes engine.
+
+        Return the number of lines.
+    """
+
+    if not 0 <= ipv6_ratio <= 1:
+        raise ValueError(f"The IPv6 ratio must be between 0 and 1: {ipv6_ratio}")
+
+    if distinct_ips < 1:
+        raise ValueError(f"The number of distinct IPs must be positive: {distinct_ips}")
+
+    generator = random.Random(seed)
+
+    ips = []
+    for _ in range(distinct_ips):
+        if generator.random() < ipv6_ratio:
+            ips.append("2001:db8:{:x}:{:x}::{:x}".format(generator.getrandbits(16),
+                                                        generator.getrandbits(16),
+                                                        generator.getrandbits(16)))
+        else:
+            ips.append("{}.{}.{}.{}".format(generator.randrange(1, 224),
+                                            generator.getrandbits(8),
+                                            generator.getrandbits(8),
+                                            generator.getrandbits(8)))
+
+    lines = 0
+    written = 0
+    timestamp = 1760097600 # 2025-10-10T12:00:00Z
+
+    with open(path, 'w', encoding="utf-8", newline='') as f:
+        while written < size:
+            timestamp += generator.randrange(3)
+            date = time.strftime("%d/%b/%Y:%H:%M:%S +0000", time.gmtime(timestamp))
+
+            line = (f'{generator.choice(ips)} - - [{date}] '
+                    f'"{generator.choice(_METHODS)} {generator.choice(_PATHS)}?id={generator.getrandbits(20)} HTTP/1.1" '
+                    f'{generator.choice(_STATUSES)} {generator.randrange(100, 50000)} '
+                    f'"-" "{generator.choice(_USER_AGENTS)}"\n')
+
+            f.write(line)
+            written += len(line)
+            lines += 1
+
+    return lines
+
+def benchmark_engine(input_path:str,
+                     output_path:str,
+                     engine:Literal["text", "bytes", "text-parallel", "bytes-parallel"],
+                     workers:None | int=None) -> dict:
+    """
+        Time `anonymize_log_file` with an engine. The run is done in a new process,
+        so its peak RSS is not mixed with the previous runs.
+
+        workers:
+            Processes of the parallel engines, None for all the CPUs.
+
+        Return the seconds, lines/s, MB/s, and the peak RSS (MB) of the process
+        and of its largest worker.
+    """
+
+    if engine not in _ENGINES:
+        raise ValueError(f"Unknown engine: {engine}, use one of {', '.join(_ENGINES)}")
+
+    if engine.endswith("-parallel"):
+        workers = os.cpu_count() if workers is None else workers
+    else:
+        workers = 1
+
+    with open(input_path, 'rb') as f:
+        lines = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1024 * 1024), b""))
+
+    size = os.path.getsize(input_path)
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        seconds, peak_rss, workers_peak_rss = executor.submit(__run_engine,
+                                                              input_path,
+                                                              output_path,
+                                                              engine,
+                                                              workers).result()
+
+    return {"engine": engine,
+            "workers": workers,
+            "lines": lines,
+            "megabytes": size / (1024 * 1024),
+            "seconds": seconds,
+            "lines_per_second": lines / max(seconds, 1e-9),
+            "megabytes_per_second": size / (1024 * 1024) / max(seconds, 1e-9),
+            "peak_rss_mb": peak_rss,
+            "workers_peak_rss_mb": workers_peak_rss}
+
+def __run_engine(input_path:str, output_path:str, engine:str, workers:int) -> tuple[float, float, float]:
+    """
+        Executed in a new process, see `benchmark_engine`.
+    """
+
+    anonymizer = BytesAnonymizer() if engine.startswith("bytes") else TextAnonymizer()
+
+    start_time = time.perf_counter()
+    anonymize_log_file(input_path, output_path, workers=workers, anonymizer=anonymizer)
+    seconds = time.perf_counter() - start_time
+
+    # ru_maxrss is in kilobytes on Linux
+    return (seconds,
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024)
+
+def run_benchmark(size:int=256 * 1024 * 1024,
+                  ipv6_ratio:float=0.2,
+                  distinct_ips:int=_DISTINCT_IPS,
+                  engines:tuple[str, ...]=_ENGINES,
+                  workers:None | int=None,
+                  repeat:int=1,
+                  work_dir:None | str=None,
+                  verbose:bool=True) -> list[dict]:
+    """
+        Generate a synthetic log (see `generate_log`) and time each engine on it
+        (see `benchmark_engine`). The best of `repeat` runs is kept.
+
+        work_dir:
+            Directory of the generated log and of the outputs. None for a temporary
+            directory, removed at the end.
+
+        Return the results of the engines.
+    """
+
+    if repeat < 1:
+        raise ValueError(f"The number of runs must be positive: {repeat}")
+
+    for engine in engines:
+        if engine not in _ENGINES:
+            raise ValueError(f"Unknown engine: {engine}, use one of {', '.join(_ENGINES)}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+
+        if work_dir is None:
+            work_dir = temp_dir
+
+        input_path = os.path.join(work_dir, "synthetic_access.log")
+        output_path = os.path.join(work_dir, "synthetic_access.anonymized.log")
+
+        if verbose:
+            print(f" generating {size / (1024 * 1024):.0f} MB, {ipv6_ratio:.0%} IPv6, {distinct_ips} clients...")
+
+        generate_log(input_path, size, ipv6_ratio, distinct_ips)
+
+        results = []
+        for engine in engines:
+            result = min((benchmark_engine(input_path, output_path, engine, workers) for _ in range(repeat)),
+                         key=lambda run: run["seconds"])
+            results.append(result)
+
+            if verbose:
+                print(f" {engine:<15} workers={result['workers']:<3} "
+                      f"{result['seconds']:8.2f} s "
+                      f"{result['lines_per_second']:12,.0f} lines/s "
+                      f"{result['megabytes_per_second']:8.1f} MB/s "
+                      f"peak RSS {result['peak_rss_mb']:.0f} MB (workers {result['workers_peak_rss_mb']:.0f} MB)")
+
+    return results
+
+if __name__ == "__main__":
+
+    arguments = sys.argv[1:]
+    size_mb = pop_option(arguments, "--size", 256)
+    ipv6_part = pop_option(arguments, "--ipv6", 0.2, float)
+    clients = pop_option(arguments, "--distinct-ips", _DISTINCT_IPS)
+    engine_names = pop_option(arguments, "--engines", ",".join(_ENGINES), str)
+    workers_nb = pop_option(arguments, "--workers", None)
+    runs = pop_option(arguments, "--repeat", 1)
+    work_path = pop_option(arguments, "--dir", None, str)
+    json_path = pop_option(arguments, "--json", None, str)
+
+    if arguments:
+        print("Usage: python benchmark_anonymize.py [--size MB] [--ipv6 RATIO] [--distinct-ips N] "
+              f"[--engines {','.join(_ENGINES)}] [--workers N] [--repeat N] [--dir PATH] [--json PATH]")
+        sys.exit(1)
+
+    benchmark_results = run_benchmark(size=size_mb * 1024 * 1024,
+                                      ipv6_ratio=ipv6_part,
+                                      distinct_ips=clients,
+                                      engines=tuple(engine_names.split(",")),
+                                      workers=workers_nb,
+                                      repeat=runs,
+                                      work_dir=work_path)
+
+    if json_path is not None:
+        with open(json_path, 'w') as json_file:
+            json.dump(benchmark_results, json_file, indent=4)
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+
+#
+# Copyright (c) 2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import nginx.anonymize_access as anonymize_access
+
+
+class TestFollowLogFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.directory.name, "access.log")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def append(self, path, text):
+        with open(path, "a") as f:
+            f.write(text)
+
+    def follow(self, on_poll):
+        """
+            Follow the log, calling on_poll at each check of the path, until the
+            callback returns False.
+        """
+
+        output_file = io.BytesIO()
+        real_stat = os.stat
+
+        def stat(path, *args, **kwargs):
+            if path == self.log_path and on_poll() is False:
+                raise KeyboardInterrupt
+            return real_stat(path, *args, **kwargs)
+
+        with mock.patch.object(anonymize_access.os, "stat", side_effect=stat), \
+                mock.patch.object(anonymize_access.time, "sleep"):
+            with self.assertRaises(KeyboardInterrupt):
+                anonymize_access.follow_log_file(self.log_path, output_file, poll_interval=0)
+
+        return output_file.getvalue().decode("utf-8").splitlines()
+
+    def test_lines_written_before_the_rotation(self):
+        self.append(self.log_path, "first\n")
+        polls = []
+
+        def on_poll():
+            polls.append(None)
+
+            if len(polls) == 1:
+                # written after the last read of the old file, then rotated
+                self.append(self.log_path, "late\n")
+                os.rename(self.log_path, self.log_path + ".1")
+                self.append(self.log_path, "rotated\n")
+
+            return len(polls) < 3
+
+        self.assertEqual(self.follow(on_poll), ["first", "late", "rotated"])
+
+    def test_partial_line_before_the_rotation(self):
+        self.append(self.log_path, "first\n")
+        polls = []
+
+        def on_poll():
+            polls.append(None)
+
+            if len(polls) == 1:
+                self.append(self.log_path, "partial")
+                os.rename(self.log_path, self.log_path + ".1")
+                self.append(self.log_path, "rotated\n")
+
+            return len(polls) < 3
+
+        self.assertEqual(self.follow(on_poll), ["first", "partial", "rotated"])
+
+    def test_truncated_file(self):
+        self.append(self.log_path, "first\n")
+        polls = []
+
+        def on_poll():
+            polls.append(None)
+
+            if len(polls) == 1:
+                with open(self.log_path, "w") as f:
+                    f.write("new\n")
+
+            return len(polls) < 3
+
+        self.assertEqual(self.follow(on_poll), ["first", "new"])
@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+
+#
+#   This file is part of JSEncoder.
+#
+# Copyright (c) 2022-2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+"""
+    Allocation of the encoded names: the most used symbols get the shortest names.
+"""
+
+import itertools
+import string
+
+
+class NameSettings:
+    # words that are never given as names
+    _reserved_names = frozenset(('break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default',
+                                 'delete', 'do', 'else', 'export', 'extends', 'finally', 'for', 'function', 'if',
+                                 'import', 'in', 'instanceof', 'new', 'return', 'super', 'switch', 'this', 'throw',
+                                 'try', 'typeof', 'var', 'void', 'while', 'with', 'null', 'true', 'false', 'enum',
+                                 'let', 'static', 'yield', 'await', 'async', 'of', 'get', 'set', 'as', 'from',
+                                 'eval', 'arguments', 'undefined', 'NaN', 'Infinity', 'implements', 'interface',
+                                 'package', 'private', 'protected', 'public'))
+
+    # the short names can not look like the indexed names (f1, C2, CL3, mp4, a1, ...)
+    _name_chars = string.ascii_lowercase + string.ascii_uppercase
+
+
+class NameAllocator:
+    """
+        Count the occurrences of the symbols, then give the names (from the shortest)
+        to the most used symbols first. The symbols used equally keep the order in
+        which they were added.
+    """
+
+    def __init__(self, names, taken=()):
+        self.__names = iter(names)  # names from the shortest, never given twice
+        self.__taken = taken  # names that can not be given: the skip lists, the names in use
+        self.__counts = {}
+
+    def add(self, symbol, count=1):
+        self.__counts[symbol] = self.__counts.get(symbol, 0) + count
+
+    def allocate(self) -> dict:
+        """
+            Return the name of each symbol.
+        """
+
+        allocation = {}
+
+        for symbol in sorted(self.__counts.keys(), key=lambda item: -self.__counts[item]):
+            allocation[symbol] = next(name for name in self.__names
+                                      if name not in self.__taken and name not in NameSettings._reserved_names)
+
+        return allocation
+
+
+def iter_short_names():
+    """
+        Yield a, b, ..., Z, aa, ab, ...
+    """
+
+    for length in itertools.count(1):
+        for chars in itertools.product(NameSettings._name_chars, repeat=length):
+            yield "".join(chars)
+
+
+def iter_index_names(prefix, start=0):
+    """
+        Yield prefix0, prefix1, ...
+    """
+
+    for index in itertools.count(start):
+        yield prefix + str(index)
+
+
+def rank_encodes(items, occurrences, prefix, start=0):
+    """
+        Give again the encodes of items (name: encode), the most used names getting the
+        lowest indexes.
+
+        occurrences:
+            The positions of each name (see `__get_word_occurrences`).
+    """
+
+    allocator = NameAllocator(iter_index_names(prefix, start))
+
+    for name in items.keys():
+        allocator.add(name, len(occurrences.get(name, ())))
+
+    items.update(allocator.allocate())
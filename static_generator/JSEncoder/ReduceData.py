@@ -16,6 +16,8 @@
 
 from collections import OrderedDict
 
+from static_generator.JSEncoder.Names import rank_encodes
+
 
 class ReduceData:
 
@@ -93,6 +95,14 @@ class ReduceData:
 
         return class_data.properties
 
+    def rank_class_names(self, occurrences):
+        """
+            Give the lowest indexes to the most used properties & private methods.
+        """
+
+        for class_data in self.classes.values():
+            class_data.rank_names(occurrences)
+
     def add_property(self, name, prop_name):
 
         class_data = self.__get_class(name)
@@ -440,6 +450,18 @@ class ReduceClass:
         except KeyError:
             return None
 
+    def rank_names(self, occurrences):
+
+        rank_encodes(self.properties, occurrences, "p")
+
+        private_methods = OrderedDict((method.name, method.encode) for method in self.methods.values()
+                                      if method.encode is not None)
+
+        rank_encodes(private_methods, occurrences, "m", 1)
+
+        for method_name, method_encode in private_methods.items():
+            self.methods[method_name].encode = method_encode
+
     def add_method_arg(self, method_name, arg_name):
 
         if method_name in self.methods.keys():
@@ -505,6 +527,9 @@ class ReduceConstant:
 
         return False, None
 
+    def rank_parameters(self, occurrences):
+        rank_encodes(self.parameters, occurrences, "p")
+
     def __str__(self):
         text = "\n const {:<150} {}".format(self.encode, self.name)
 
@@ -0,0 +1,784 @@
+#!/usr/bin/python3
+
+#
+#   This file is part of JSEncoder.
+#
+# Copyright (c) 2022-2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+"""
+    Lexical scope tree of a JS text, built from its words (see `tokenize_js`):
+    the functions, arrow functions, blocks, classes, catch clauses and for loops,
+    with the names declared in each of them and the scope of every reference.
+
+    It allows to rename the local names of every scope to the shortest free
+    names (see `reduce_scopes`), without touching the global names, the
+    properties (obj.name), the object keys ({name: value}) and the methods.
+"""
+
+from static_generator.JSEncoder.Names import NameAllocator, iter_short_names
+
+
+class ScopeSettings:
+    # words that are never a reference to a name
+    _keywords = frozenset(('break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default', 'delete',
+                           'do', 'else', 'export', 'extends', 'finally', 'for', 'function', 'if', 'import', 'in',
+                           'instanceof', 'new', 'return', 'super', 'switch', 'this', 'throw', 'try', 'typeof',
+                           'var', 'void', 'while', 'with', 'null', 'true', 'false', 'enum'))
+
+    # a "/" or a name after them does not end an expression
+    _expression_keywords = frozenset(('return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+                                      'throw', 'case', 'do', 'else', 'yield', 'await', 'extends'))
+
+    _block_keywords = ('else', 'try', 'finally', 'do')
+    _member_modifiers = ('static', 'get', 'set', 'async')
+
+
+class Binding:
+    __slots__ = ("name", "scope", "positions", "encode")
+
+    def __init__(self, name, scope):
+        self.name = name
+        self.scope = scope
+        self.positions = []  # declarations & references
+        self.encode = None  # new name
+
+
+class Scope:
+
+    def __init__(self, kind, parent):
+        self.kind = kind  # global, function, class, block, catch
+        self.parent = parent
+        self.children = []
+        self.bindings = {}  # name: Binding
+        self.references = []  # (position, name)
+        self.outer_bindings = set()  # bindings of the parent scopes used by this scope or its children
+
+        if parent is not None:
+            parent.children.append(self)
+
+    def get_function_scope(self):
+        """
+            Return the scope of the "var" declarations.
+        """
+
+        scope = self
+        while scope.kind not in ("function", "global"):
+            scope = scope.parent
+
+        return scope
+
+    def add_binding(self, name, position):
+
+        binding = self.bindings.get(name)
+
+        if binding is None:
+            binding = Binding(name, self)
+            self.bindings[name] = binding
+
+        binding.positions.append(position)
+
+        return binding
+
+    def find_binding(self, name):
+
+        scope = self
+        while scope is not None:
+            if name in scope.bindings:
+                return scope.bindings[name]
+
+            scope = scope.parent
+
+        return None
+
+
+class ScopeTree:
+    """
+        Parse the words of a JS text. The parser only knows the constructs that
+        declare names or change the meaning of a name (property, object key,
+        method, label), the rest is a sequence of references.
+    """
+
+    def __init__(self, search_words):
+        self.words = search_words
+        self.positions = []  # position (in search_words) of each significant word
+        self.newlines = []  # True if there is a line break before the significant word
+        self.matches = {}  # index of a bracket: index of the closing one
+        self.keys = set()  # positions of the object keys & method names
+        self.shorthands = set()  # positions of {name} (both a key and a name)
+        self.unsafe = False  # eval or with: the names can not be renamed
+
+        newline = False
+
+        for i, word in enumerate(search_words):
+            if word.strip() == "" or word.startswith(("//", "/*")):
+                newline = newline or "\n" in word
+            else:
+                self.positions.append(i)
+                self.newlines.append(newline)
+                newline = False
+
+        self.__match_brackets()
+
+        self.root = Scope("global", None)
+        self.__parse(0, len(self.positions), self.root, "statements")
+        self.__resolve_references(self.root)
+
+    #
+    # Words
+    #
+
+    def __word(self, k):
+        if 0 <= k < len(self.positions):
+            return self.words[self.positions[k]]
+
+        return ""
+
+    def __is_name(self, k):
+        word = self.__word(k)
+        return word != "" and (word[0].isalpha() or word[0] in "_$#") and word not in ScopeSettings._keywords
+
+    def __is_arrow(self, k):
+        # "=>" are two punctuators, without space between them
+        return self.__word(k) == "=" and self.__word(k + 1) == ">" and \
+            self.positions[k] + 1 == self.positions[k + 1]
+
+    def __is_property(self, k):
+        # obj.name or obj?.name, but not ...name
+        return self.__word(k - 1) == "." and \
+            not (self.__word(k - 2) == "." and self.positions[k - 2] + 1 == self.positions[k - 1])
+
+    def __is_spread(self, k):
+        return self.__word(k) == "." and self.__word(k + 1) == "." and self.__word(k + 2) == "." and \
+            self.positions[k] + 2 == self.positions[k + 2]
+
+    def __ends_expression(self, k):
+        word = self.__word(k)
+
+        if word == "" or word in (")", "]", "}"):
+            return word != ""
+
+        if len(word) == 1 and not (word[0].isalnum() or word[0] in "_$"):
+            return False
+
+        return word not in ScopeSettings._expression_keywords
+
+    def __starts_statement(self, k):
+        # a line starting with ( [ or ` continues the expression of the previous line
+        word = self.__word(k)
+        return word != "" and (word[0].isalnum() or word[0] in "_$#'\"{") and \
+            word not in ("in", "of", "instanceof")
+
+    def __is_statement_start(self, k):
+        # the previous word ends a statement, or a line break after an expression
+        previous = self.__word(k - 1)
+
+        if previous in ("async", "export", "default"):
+            return self.__is_statement_start(k - 1)
+
+        return previous in ("", ";", "{", "}") or previous in ScopeSettings._block_keywords or \
+            (self.newlines[k] and self.__ends_expression(k - 1))
+
+    def __match_brackets(self):
+
+        stack = []
+
+        for k, position in enumerate(self.positions):
+            word = self.words[position]
+
+            if word in ("(", "[", "{"):
+                stack.append(k)
+
+            elif word in (")", "]", "}"):
+                if len(stack) > 0:
+                    self.matches[stack.pop()] = k
+
+            elif word.startswith("}") and len(word) > 1:
+                # template: }text${ or }text`
+                if len(stack) > 0:
+                    self.matches[stack.pop()] = k
+
+                if word.endswith("${"):
+                    stack.append(k)
+
+            elif word.startswith("`") and word.endswith("${") and len(word) > 1:
+                stack.append(k)
+
+        # the unclosed brackets end with the text
+        for k in stack:
+            self.matches[k] = len(self.positions)
+
+    def __find_end(self, k, end, stops=(",", ";")):
+        """
+            Return the index of the end of the expression starting at k: a stop word
+            or a line break ending the statement, outside the brackets.
+        """
+
+        start = k
+
+        while k < end:
+            word = self.__word(k)
+
+            if word in stops:
+                return k
+
+            if k > start and self.newlines[k] and self.__ends_expression(k - 1) and self.__starts_statement(k):
+                return k
+
+            if k in self.matches and word != "}":
+                k = self.matches[k] + 1
+                if self.__word(k - 1).endswith("${"):
+                    k -= 1  # the template continues
+            else:
+                k += 1
+
+        return end
+
+    #
+    # Parser
+    #
+
+    def __parse(self, k, end, scope, mode):
+        """
+            Parse the words [k, end[ in a mode: statements, expression, object or class.
+        """
+
+        key_position = mode in ("object", "class")
+
+        while k < end:
+
+            word = self.__word(k)
+
+            if mode == "object" and key_position:
+                k = self.__parse_object_member(k, end, scope)
+                key_position = False
+                continue
+
+            if mode == "class" and key_position:
+                k = self.__parse_class_member(k, end, scope)
+                continue
+
+            if word == "," and mode == "object":
+                key_position = True
+                k += 1
+
+            elif word.startswith("`") or (word.startswith("}") and len(word) > 1):
+                # template, the expressions are parsed until the next part
+                if word.endswith("${"):
+                    close = self.matches.get(k, end)
+                    self.__parse(k + 1, close, scope, "expression")
+                    k = close if close < end and self.__word(close).endswith("${") else close + 1
+                else:
+                    k += 1
+
+            elif word == "(":
+                close = self.matches.get(k, end)
+
+                if self.__is_arrow(close + 1):
+                    arrow_scope = Scope("function", scope)
+                    self.__parse_patterns(k + 1, close, arrow_scope, arrow_scope)
+                    k = self.__parse_arrow_body(close + 3, end, arrow_scope)
+                else:
+                    self.__parse(k + 1, close, scope, "expression")
+                    k = close + 1
+
+            elif word == "[":
+                close = self.matches.get(k, end)
+                self.__parse(k + 1, close, scope, "expression")
+                k = close + 1
+
+            elif word == "{":
+                close = self.matches.get(k, end)
+
+                if mode == "statements" and self.__is_block(k):
+                    self.__parse(k + 1, close, Scope("block", scope), "statements")
+                else:
+                    self.__parse(k + 1, close, scope, "object")
+
+                k = close + 1
+
+            elif self.__is_property(k) or not (self.__is_name(k) or word in ScopeSettings._keywords):
+                k += 1
+
+            elif word == "function":
+                k = self.__parse_function(k, end, scope, mode == "statements" and self.__is_statement_start(k))
+
+            elif word == "class":
+                k = self.__parse_class(k, end, scope, mode == "statements" and self.__is_statement_start(k))
+
+            elif word in ("var", "const") or \
+                    (word == "let" and (self.__is_name(k + 1) or self.__word(k + 1) in ("[", "{"))):
+                binding_scope = scope.get_function_scope() if word == "var" else scope
+                k = self.__parse_declarations(k + 1, end, scope, binding_scope)
+
+            elif word == "catch" and self.__word(k + 1) == "(":
+                close = self.matches.get(k + 1, end)
+                catch_scope = Scope("catch", scope)
+                self.__parse_patterns(k + 2, close, catch_scope, catch_scope)
+                k = self.__parse_body(close + 1, end, catch_scope)
+
+            elif word == "for" and mode == "statements":
+                k = self.__parse_for(k, end, scope)
+
+            elif word in ("break", "continue"):
+                # break label;
+                k += 2 if self.__is_name(k + 1) and not self.newlines[k + 1] else 1
+
+            elif mode == "statements" and self.__word(k + 1) == ":" and self.__is_statement_start(k):
+                # label:
+                k += 2
+
+            elif self.__is_arrow(k + 1):
+                arrow_scope = Scope("function", scope)
+                arrow_scope.add_binding(word, self.positions[k])
+                k = self.__parse_arrow_body(k + 3, end, arrow_scope)
+
+            else:
+                if word in ("eval", "with"):
+                    self.unsafe = True
+
+                if word not in ScopeSettings._keywords:
+                    scope.references.append((self.positions[k], word))
+
+                k += 1
+
+        return k
+
+    def __declare(self, k, scope, binding_scope):
+        """
+            Declare the name at k in binding_scope. A "var" or a function declared in a
+            block is bound to the function: the scopes between them must not give its
+            name to another binding, ex: { let a; var b; } --> { let x; var x; }
+        """
+
+        binding = binding_scope.add_binding(self.__word(k), self.positions[k])
+
+        while scope is not binding_scope:
+            scope.outer_bindings.add(binding)
+            scope = scope.parent
+
+    def __is_block(self, k):
+        """
+            Return True if the "{" at k (in statements) starts a block, and not an object.
+        """
+
+        previous = self.__word(k - 1)
+
+        if previous == ")" or self.__is_statement_start(k):
+            return True
+
+        if previous == ":":
+            # case x: {  or  label: {   but not   a ? b : {}
+            j = k - 2
+            while j >= 0 and self.__word(j) not in (";", "{", "}", "?"):
+                if self.__word(j) in ("case", "default") or (j == k - 2 and self.__is_statement_start(j)):
+                    return True
+                j -= 1
+
+        return False
+
+    def __parse_function(self, k, end, scope, declaration):
+        """
+            function name(params) {body}, the name is declared in the scope if it is a
+            declaration, and inside the function if it is an expression.
+        """
+
+        function_scope = Scope("function", scope)
+        k += 1
+
+        if self.__word(k) == "*":
+            k += 1
+
+        if self.__is_name(k):
+            if declaration:
+                self.__declare(k, scope, scope.get_function_scope())
+            else:
+                function_scope.add_binding(self.__word(k), self.positions[k])
+            k += 1
+
+        return self.__parse_method(k, end, function_scope)
+
+    def __parse_method(self, k, end, function_scope):
+        """
+            (params) {body}
+        """
+
+        if self.__word(k) != "(":
+            return k
+
+        close = self.matches.get(k, end)
+        self.__parse_patterns(k + 1, close, function_scope, function_scope)
+
+        return self.__parse_body(close + 1, end, function_scope)
+
+    def __parse_body(self, k, end, scope):
+        """
+            {statements} in the scope.
+        """
+
+        if self.__word(k) != "{":
+            return k
+
+        close = self.matches.get(k, end)
+        self.__parse(k + 1, close, scope, "statements")
+
+        return close + 1
+
+    def __parse_arrow_body(self, k, end, arrow_scope):
+
+        if self.__word(k) == "{":
+            return self.__parse_body(k, end, arrow_scope)
+
+        expression_end = self.__find_end(k, end)
+        self.__parse(k, expression_end, arrow_scope, "expression")
+
+        return expression_end
+
+    def __parse_class(self, k, end, scope, declaration):
+        """
+            class Name extends Base {body}
+        """
+
+        class_scope = Scope("class", scope)
+        k += 1
+
+        if self.__is_name(k) and self.__word(k) != "extends":
+            if declaration:
+                scope.add_binding(self.__word(k), self.positions[k])
+            else:
+                class_scope.add_binding(self.__word(k), self.positions[k])
+            k += 1
+
+        if self.__word(k) == "extends":
+            body = self.__find_end(k + 1, end, ("{",))
+            self.__parse(k + 1, body, class_scope, "expression")
+            k = body
+
+        if self.__word(k) != "{":
+            return k
+
+        close = self.matches.get(k, end)
+        self.__parse(k + 1, close, class_scope, "class")
+
+        return close + 1
+
+    def __parse_class_member(self, k, end, scope):
+        """
+            static get name(params) {body},  name = value;  static {statements}
+        """
+
+        if self.__word(k) == ";":
+            return k + 1
+
+        if self.__word(k) == "static" and self.__word(k + 1) == "{":
+            return self.__parse_body(k + 1, end, Scope("block", scope))
+
+        k = self.__parse_member_key(k, end, scope)
+
+        if self.__word(k) == "(":
+            return self.__parse_method(k, end, Scope("function", scope))
+
+        if self.__word(k) == "=":
+            value_end = self.__find_end(k + 1, end, (";",))
+            self.__parse(k + 1, value_end, Scope("function", scope), "expression")
+            return value_end
+
+        return k
+
+    def __parse_object_member(self, k, end, scope):
+        """
+            name: value,  name,  name(params) {body},  get name() {body},  [key]: value,  ...value
+        """
+
+        if self.__is_spread(k):
+            return k + 3
+
+        key = k
+        k = self.__parse_member_key(k, end, scope)
+        word = self.__word(k)
+
+        if word == "(":
+            return self.__parse_method(k, end, Scope("function", scope))
+
+        if word == ":":
+            return k + 1
+
+        if k == key + 1 and self.__is_name(key) and (k >= end or word in (",", "=")):
+            # shorthand: {name}
+            self.keys.discard(self.positions[key])
+            self.shorthands.add(self.positions[key])
+            scope.references.append((self.positions[key], self.__word(key)))
+
+        return k
+
+    def __parse_member_key(self, k, end, scope):
+        """
+            Return the index after the modifiers & the key of an object or class member.
+        """
+
+        while self.__word(k) in ScopeSettings._member_modifiers and \
+                self.__word(k + 1) not in ("(", ",", ":", "=", ";", "}", ""):
+            k += 1
+
+        if self.__word(k) == "*":
+            k += 1
+
+        if self.__word(k) == "[":
+            close = self.matches.get(k, end)
+            self.__parse(k + 1, close, scope, "expression")
+            return close + 1
+
+        if k < end:
+            self.keys.add(self.positions[k])
+            return k + 1
+
+        return k
+
+    def __parse_declarations(self, k, end, scope, binding_scope):
+        """
+            name = value, {a, b: c} = value, [d, e] = value
+        """
+
+        while k < end:
+
+            k = self.__parse_pattern(k, end, scope, binding_scope)
+
+            if self.__word(k) == "=":
+                value_end = self.__find_end(k + 1, end)
+                self.__parse(k + 1, value_end, scope, "expression")
+                k = value_end
+
+            if k < end and self.__word(k) == ",":
+                k += 1
+            else:
+                break
+
+        return k
+
+    def __parse_patterns(self, k, end, scope, binding_scope):
+        """
+            Parse a list of patterns: the parameters of a function, or an array pattern.
+        """
+
+        while k < end:
+
+            if self.__word(k) == ",":
+                k += 1
+                continue
+
+            if self.__is_spread(k):
+                k += 3
+
+            k = self.__parse_pattern(k, end, scope, binding_scope)
+
+            if self.__word(k) == "=":
+                value_end = self.__find_end(k + 1, end, (",",))
+                self.__parse(k + 1, value_end, binding_scope, "expression")
+                k = value_end
+
+            if k < end and self.__word(k) != ",":
+                # not a pattern, ex: a function call (x.y)
+                self.__parse(k, end, binding_scope, "expression")
+                return end
+
+        return k
+
+    def __parse_pattern(self, k, end, scope, binding_scope):
+        """
+            Declare the names of a pattern: name, [a, b], {a, b: c, d = 1, ...e}
+        """
+
+        word = self.__word(k)
+
+        if self.__is_name(k):
+            self.__declare(k, scope, binding_scope)
+            return k + 1
+
+        if word == "[":
+            close = self.matches.get(k, end)
+            self.__parse_patterns(k + 1, close, scope, binding_scope)
+            return close + 1
+
+        if word != "{":
+            return k
+
+        close = self.matches.get(k, end)
+        j = k + 1
+
+        while j < close:
+
+            if self.__word(j) == ",":
+                j += 1
+                continue
+
+            if self.__is_spread(j):
+                j = self.__parse_pattern(j + 3, close, scope, binding_scope)
+                continue
+
+            key = j
+
+            if self.__word(j) == "[":
+                key_close = self.matches.get(j, close)
+                self.__parse(j + 1, key_close, scope, "expression")
+                j = key_close + 1
+            else:
+                j += 1
+
+            if self.__word(j) == ":":
+                if key == j - 1:
+                    self.keys.add(self.positions[key])
+                j = self.__parse_pattern(j + 1, close, scope, binding_scope)
+
+            elif self.__is_name(key):
+                # shorthand: {name}
+                self.shorthands.add(self.positions[key])
+                self.__declare(key, scope, binding_scope)
+
+            if self.__word(j) == "=":
+                value_end = self.__find_end(j + 1, close, (",",))
+                self.__parse(j + 1, value_end, scope, "expression")
+                j = value_end
+
+            if j < close and self.__word(j) != ",":
+                j += 1
+
+        return close + 1
+
+    def __parse_for(self, k, end, scope):
+        """
+            for (let i = 0; ...) body, the names of the header are declared in a block
+            around the loop.
+        """
+
+        header = k + 1
+
+        if self.__word(header) == "await":
+            header += 1
+
+        if self.__word(header) != "(":
+            return k + 1
+
+        close = self.matches.get(header, end)
+        for_scope = Scope("block", scope)
+        self.__parse(header + 1, close, for_scope, "statements")
+
+        if self.__word(close + 1) == "{":
+            return self.__parse_body(close + 1, end, for_scope)
+
+        statement_end = self.__find_end(close + 1, end, (";",))
+        self.__parse(close + 1, statement_end, for_scope, "statements")
+
+        return statement_end
+
+    #
+    # References
+    #
+
+    def __resolve_references(self, scope):
+        """
+            Link every reference to its binding, and mark the scopes between them.
+        """
+
+        for position, name in scope.references:
+
+            binding = scope.find_binding(name)
+
+            if binding is None:
+                continue
+
+            binding.positions.append(position)
+
+            inner_scope = scope
+            while inner_scope is not binding.scope:
+                inner_scope.outer_bindings.add(binding)
+                inner_scope = inner_scope.parent
+
+        for child in scope.children:
+            self.__resolve_references(child)
+
+    def get_free_names(self):
+        """
+            Return the names without binding (globals, or declared in other files).
+        """
+
+        names = set()
+        scopes = [self.root]
+
+        while len(scopes) > 0:
+            scope = scopes.pop()
+            scopes += scope.children
+
+            for _, name in scope.references:
+                if scope.find_binding(name) is None:
+                    names.add(name)
+
+        return names
+
+
+def reduce_scopes(search_words, skip_items=None):
+    """
+        Rename the names declared inside the functions, arrow functions, blocks, classes
+        and catch clauses to the shortest free names, the most used names of a scope first.
+        The sibling scopes reuse the same names. The global names are not renamed, since
+        other files may use them.
+
+        Return the new words, and the encode dictionary of the renamed names.
+    """
+
+    if skip_items is None:
+        skip_items = []
+
+    tree = ScopeTree(search_words)
+
+    if tree.unsafe:
+        return list(search_words), "\n[scopes] not reduced: eval or with is used\n"
+
+    # names that must be kept: globals, and the bindings that are not renamed
+    fixed_names = tree.get_free_names() | set(tree.root.bindings.keys()) | set(skip_items)
+
+    new_words = list(search_words)
+    dictionary = []
+    scopes = list(reversed(tree.root.children))
+
+    while len(scopes) > 0:
+        scope = scopes.pop()
+        scopes += reversed(scope.children)
+
+        taken = fixed_names | {binding.encode or binding.name for binding in scope.outer_bindings}
+        allocator = NameAllocator(iter_short_names(), taken)
+
+        for binding in sorted(scope.bindings.values(), key=lambda item: item.positions[0]):
+            if binding.name not in skip_items:
+                allocator.add(binding, len(binding.positions))
+
+        for binding, encode in allocator.allocate().items():
+
+            binding.encode = encode
+
+            for position in binding.positions:
+                if position in tree.shorthands:
+                    new_words[position] = "{}:{}".format(binding.name, binding.encode)
+                else:
+                    new_words[position] = binding.encode
+
+            dictionary.append("\t{}:{}".format(binding.encode, binding.name))
+
+    return new_words, "\n[scopes]\n" + "\n".join(dictionary) + "\n"
+
+
+def get_object_keys(search_words):
+    """
+        Return the positions of the object keys & method names ({key: value}), and of
+        the shorthand properties ({name}) of a JS text.
+    """
+
+    tree = ScopeTree(search_words)
+    return tree.keys, tree.shorthands
+
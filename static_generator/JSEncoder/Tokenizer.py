@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+
+#
+#   This file is part of JSEncoder.
+#
+# Copyright (c) 2022-2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+import re
+
+
+class TokenType:
+    _identifier = "identifier"  # names and keywords
+    _number = "number"
+    _punctuator = "punctuator"  # a single char: the reduce compares them one by one
+    _string = "string"
+    _template = "template"  # `text${  }text${  }text` : the expressions are tokens
+    _regex = "regex"
+    _comment = "comment"
+    _whitespace = "whitespace"
+
+
+class TokenizerSettings:
+    # the tokens that do not depend on the previous ones, the last group is any other char
+    _re_token = re.compile(r"""(\s+)|"""
+                           r"""(#?(?:[^\W\d]|\$)[\w$]*)|"""
+                           r"""((?:0[xXoObB][\da-fA-F_]+|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?)n?)|"""
+                           r"""('(?:[^'\\\n]|\\[\s\S])*'?|"(?:[^"\\\n]|\\[\s\S])*"?)|"""
+                           r"""([\s\S])""")
+    _token_types = (None, TokenType._whitespace, TokenType._identifier, TokenType._number, TokenType._string,
+                    TokenType._punctuator)
+    _re_template = re.compile(r'(?:[^`\\$]|\\[\s\S]|\$(?!\{))*(?:`|\$\{)?')
+    _re_regex = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*')
+    _re_line_comment = re.compile(r'//[^\n]*')
+    _re_block_comment = re.compile(r'/\*[\s\S]*?(?:\*/|$)')
+
+    # after them, a "/" starts a regex and not a division
+    _regex_keywords = ('return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case',
+                       'do', 'else', 'yield', 'await')
+
+
+class Token:
+    __slots__ = ("type", "value", "start")
+
+    def __init__(self, token_type, value, start):
+        self.type = token_type
+        self.value = value
+        self.start = start  # offset in the text
+
+    def __repr__(self):
+        return "Token({}, {!r}, {})".format(self.type, self.value, self.start)
+
+    def is_significant(self):
+        return self.type not in (TokenType._whitespace, TokenType._comment)
+
+
+def tokenize_js(text):
+    """
+        Yield the tokens of a JS text, in a single scan. Joining their values gives
+        back the text.
+
+        A "/" is a regex when the previous significant token can not end an
+        expression (ex: "(", "=", "return"), and a division otherwise. A postfix
+        "++" or "--" ends an expression: in "a++ / 2" the "/" is a division, but
+        in "a+++ /x/" (a++ + /x/) it is a regex. A keyword used as a property
+        (obj.return) also ends an expression.
+    """
+
+    position = 0
+    length = len(text)
+    braces = []  # True for the "${" of a template, False for a "{"
+    previous = None  # previous significant token
+    before_previous = None  # significant token before the previous one
+    previous_run = 0  # number of adjacent equal punctuators ending with the previous token
+
+    while position < length:
+
+        match = TokenizerSettings._re_token.match(text, position)
+        token_type = TokenizerSettings._token_types[match.lastindex]
+
+        if token_type == TokenType._punctuator:
+
+            char = match.group()
+
+            if char == "`" or (char == "}" and len(braces) > 0 and braces[-1]):
+
+                if char == "}":
+                    braces.pop()
+
+                match = TokenizerSettings._re_template.match(text, position + 1)
+                token_type = TokenType._template
+
+                if match.group().endswith("${"):
+                    braces.append(True)
+
+            elif char == "/" and text.startswith("//", position):
+                match = TokenizerSettings._re_line_comment.match(text, position)
+                token_type = TokenType._comment
+
+            elif char == "/" and text.startswith("/*", position):
+                match = TokenizerSettings._re_block_comment.match(text, position)
+                token_type = TokenType._comment
+
+            elif char == "/" and __regex_allowed(previous, before_previous, previous_run) and \
+                    TokenizerSettings._re_regex.match(text, position) is not None:
+                match = TokenizerSettings._re_regex.match(text, position)
+                token_type = TokenType._regex
+
+            elif char == "{":
+                braces.append(False)
+
+            elif char == "}" and len(braces) > 0:
+                braces.pop()
+
+        end = match.end()
+        token = Token(token_type, text[position:end], position)
+
+        if token_type != TokenType._whitespace and token_type != TokenType._comment:
+            if token_type == TokenType._punctuator and previous is not None and \
+                    previous.value == token.value and previous.start + 1 == position:
+                previous_run += 1
+            else:
+                previous_run = 1
+
+            before_previous = previous
+            previous = token
+
+        position = end
+
+        yield token
+
+
+def __regex_allowed(previous, before_previous, previous_run):
+
+    if previous is None:
+        return True
+
+    if previous.type == TokenType._punctuator:
+
+        if previous.value in ("+", "-") and previous_run % 2 == 0:
+            # "++" or "--": the operand of a prefix one can not be a regex, so it is a postfix one
+            return False
+
+        return previous.value not in (")", "]", "}")
+
+    if previous.type == TokenType._identifier:
+        return previous.value in TokenizerSettings._regex_keywords and \
+            (before_previous is None or before_previous.value != ".")
+
+    return False
@@ -14,28 +14,26 @@
 # See the LICENSE file for more details.
 
 """
-    + THE CODE MUST NOT HAVE COMMENTS OR THE REDUCE WILL NOT PROPERLY WORK.
-
     + Only "self" can be used as substitute for "this" on closure functions.
-    + Avoid using dictionary keys with variables names, example:
-
-        [{x: x}]
-
-        because the key "x" will be replaced with the variable "x". A real case error arrived with:
+    + The dictionary keys are not renamed, and the shorthand keys are expanded:
 
-        [{data: data}]  and was replaced with [{data: chart_data}]
+        [{data: data}, {data}]  is replaced with  [{data: a}, {data:a}]
 
     Advices:
         Avoid using 'list' item for accessing dictionaries: SESSION_DATA["ulogged"] instead SESSION_DATA.ulogged
 """
 
+import itertools
 import os
 import re
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from static_generator.JSEncoder.Names import NameAllocator, iter_index_names, iter_short_names
 from static_generator.JSEncoder.ReduceData import ReduceData
+from static_generator.JSEncoder.Scopes import reduce_scopes, get_object_keys
+from static_generator.JSEncoder.Tokenizer import tokenize_js
 
 __FUNCTION_INDEX = 0  # some JS files my load other files, functions must not be overwritten
 __CONSTANT_INDEX = 0  # some JS files my load other files, functions must not be overwritten
@@ -44,17 +42,87 @@ __CLASS_INDEX = 0  # some JS files my load other files, functions must not be ov
 class ReduceSettings:
     _debug = False
     _min_var_replacement_len = 3  # var abc
-    _single_line_comments = ('/"/g', "/'/g")  # JS chars with an un-finished comment character
     _exclude_public_method_names = ['constructor',
                                      'addEventListener',
                                      'display',
                                      'onclick',
                                      'onreadystatechange']
-    _re_split_js = r'([\s\[\]\(\)\{\}\'\*\"\?\+\.\-:;,%/!&|=<>])'  # ([\s\[\](){}.:;,"\'*?%/!&|=+-<>])
+    _relocation_mark = "\x00"  # surrounds the indexes of the relocatable names
+    _re_relocatable_name = re.compile(r'(f|C|CL)\x00(\d+)\x00')
+    _re_padded_row = re.compile(r'(.*?)( *) ([^ ]+)$')
+    _re_name = re.compile(r'[A-Za-z_$][\w$]*')
+
+def get_reduce_indexes() -> tuple[int, int, int]:
+    """
+        Return the global (function, constant, class) indexes used by `reduce_js`
+        for the names shared between the files.
+    """
+    return __FUNCTION_INDEX, __CONSTANT_INDEX, __CLASS_INDEX
+
+def set_reduce_indexes(indexes: tuple[int, int, int]):
+    """
+        Restore the global indexes returned by `get_reduce_indexes`, ex: when the
+        result of `reduce_js` is loaded from a cache.
+    """
+    global __FUNCTION_INDEX, __CONSTANT_INDEX, __CLASS_INDEX
+    __FUNCTION_INDEX, __CONSTANT_INDEX, __CLASS_INDEX = indexes
+
+def relocate_js(text: str, indexes: tuple[int, int, int], dictionary: bool = False) -> str:
+    """
+        Shift the names of a text reduced with `relocatable=True` by the global
+        (function, constant, class) indexes, as if the text was reduced after them.
 
-def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False, skip_items=None, verbose=True):
+        dictionary:
+            The text is the encode dictionary returned by `reduce_js`. The padding
+            is adjusted to the length of the new names, to keep the columns aligned.
+    """
+
+    offsets = dict(zip(("f", "C", "CL"), indexes))
+
+    def shift_name(match):
+        prefix, index = match.groups()
+        return prefix + str(int(index) + offsets[prefix])
+
+    if not dictionary:
+        return ReduceSettings._re_relocatable_name.sub(shift_name, text)
+
+    lines = text.split("\n")
+
+    for i, line in enumerate(lines):
+
+        if ReduceSettings._relocation_mark not in line:
+            continue
+
+        # "{:<150} {}".format(encode, name)
+        match = ReduceSettings._re_padded_row.match(line)
+
+        if match is None:
+            lines[i] = ReduceSettings._re_relocatable_name.sub(shift_name, line)
+            continue
+
+        head, padding, name = match.groups()
+        new_head = ReduceSettings._re_relocatable_name.sub(shift_name, head)
+        padding = " " * max(0, len(padding) + len(head) - len(new_head))
+
+        lines[i] = new_head + padding + " " + name
+
+    return "\n".join(lines)
+
+def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False, skip_items=None, verbose=True,
+              relocatable=False, scopes=False):
     """
         reduce the size of private methods
+
+        scopes:
+            Rename the local names of every scope (see `reduce_scopes`) to the shortest free
+            names: the nested functions, the arrow functions, the blocks and the short names
+            included. It replaces the renaming of the arguments and variables done by
+            vars_on_functions & vars_on_methods, which still find the functions and the classes.
+
+        relocatable:
+            Mark the names using the global indexes, so `relocate_js` can shift them later.
+            This allows to reduce files in parallel, starting from the indexes (0, 0, 0),
+            and to get the same result as reducing them one after another.
     """
     global __CONSTANT_INDEX, __FUNCTION_INDEX, __CLASS_INDEX
 
@@ -69,11 +137,8 @@ def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False,
     # Prepare the items to search
     #
 
-    search_words = re.split(ReduceSettings._re_split_js, text)
-
-    # Remove empty chars. Why they are empty chars?
-    search_words = [char for char in search_words if not char == '']
-    search_words = __join_text_comments(search_words)
+    # the strings, templates, regex and comments are single words
+    search_words = [token.value for token in tokenize_js(text)]
 
     if ReduceSettings._debug:
         print(search_words)
@@ -83,7 +148,7 @@ def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False,
     #
 
     if vars_on_functions:
-        search_words = __reduce_js_on_functions(search_words, reduce_data)
+        search_words = __reduce_js_on_functions(search_words, reduce_data, not scopes)
 
     #
     # Get all the methods
@@ -91,7 +156,10 @@ def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False,
 
     if vars_on_methods:
         # reduce vars
-        search_words = __reduce_js_on_class(search_words, reduce_data)
+        search_words = __reduce_js_on_class(search_words, reduce_data, rename_locals=not scopes)
+
+        # the most used properties & methods get the shortest names
+        reduce_data.rank_class_names(__get_word_occurrences(search_words))
 
         # reduce method names
         search_words = __reduce_js_on_class(search_words, reduce_data, True)
@@ -114,11 +182,17 @@ def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False,
 
     func_level = 0
 
+    # the names are indexed once, and renamed at the end in a single pass
+    links = __get_word_links(search_words)
+    occurrences = __get_word_occurrences(search_words)
+    renames = {}  # position: new name
+    parameter_positions = {}  # position: (constant name, parameter name)
+
     for i, word in enumerate(search_words):
 
-        prev3_char, prev2_char, prev1_char = __get_previous_char(search_words, i, 3)
+        prev3_char, prev2_char, prev1_char = __get_previous_char(search_words, links, i, 3)
 
-        if word.strip() == "":
+        if __is_blank(word):
             continue
 
         if word == "{":
@@ -134,12 +208,8 @@ def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False,
                 ((word.startswith("__") and word not in skip_items) or
                  (public and word.replace("_", "").isalnum())) and word not in skip_items:
 
-            __CONSTANT_INDEX += 1
-            constant_encode = "C" + str(__CONSTANT_INDEX)
-            reduce_data.add_constant(word, constant_encode)
-
+            reduce_data.add_constant(word, None)
             current_constant = word
-            word = constant_encode
 
         elif word == "{" and \
                 prev1_char == "=" and \
@@ -163,16 +233,23 @@ def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False,
                 continue
 
             if word == ":":
-                added, encode = reduce_data.add_constant_parameter(current_constant, prev1_char)
+                added, _ = reduce_data.add_constant_parameter(current_constant, prev1_char)
 
                 if added:
+                    parameter_positions[links[0][i]] = (current_constant, prev1_char)
+
+    # the most used constants & parameters get the lowest indexes
+    constant_encodes = __allocate_indexes(reduce_data.constants.keys(), occurrences, "C", __CONSTANT_INDEX + 1,
+                                          relocatable)
+
+    for constant_name, constant_encode in constant_encodes.items():
+        reduce_data.constants[constant_name].encode = constant_encode
+        reduce_data.constants[constant_name].rank_parameters(occurrences)
 
-                    replaced, search_words = __replace_previous_char(search_words, prev1_char, encode, i - 1)
+    __CONSTANT_INDEX += len(constant_encodes)
 
-                    if not replaced:
-                        reduce_data.add_error(
-                            "Error replacing constant definition parameter. {}.{}:{}".format(current_constant,
-                                                                                             prev1_char, encode))
+    for i, (constant_name, param_name) in parameter_positions.items():
+        renames[i] = reduce_data.constants[constant_name].parameters[param_name]
 
     # Replace private constants when used in the code
     #
@@ -181,34 +258,33 @@ def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False,
 
         constant_data = reduce_data.constants[constant_name]
 
-        # Replace parameters
-        if len(constant_data.parameters) > 0:
+        for i in occurrences.get(constant_name, ()):
 
-            #  __CONST.PARAMETER
+            if i in renames:
+                continue
 
-            for i, word in enumerate(search_words):
+            # Replace parameters:  __CONST.PARAMETER
+            if len(constant_data.parameters) > 0:
 
-                prev2_char, prev1_char = __get_previous_char(search_words, i, 2)
+                dot_char, word = (__get_non_empty_next_chars(search_words, links, i, 2) + ["", ""])[:2]
 
-                if prev2_char == constant_name and prev1_char == ".":
+                if dot_char == ".":
 
                     try:
                         param_encode = constant_data.parameters[word]
                     except KeyError:
                         reduce_data.add_error("Parameter={} not found in constant={}".format(word, constant_name))
-                        continue
-
-                    search_words[i] = param_encode
+                    else:
+                        renames[links[1][links[1][i]]] = param_encode
 
-        # Replace constant names
-        for i, word in enumerate(search_words):
-            if word == constant_name:
-                search_words[i] = constant_data.encode
+            # Replace constant names
+            renames[i] = constant_data.encode
 
     #
     # Replace all the function names:  function __foo (){}
     #
     public_function_names = []
+    function_names = []
 
     for func_name in sorted(reduce_data.functions.keys()):
 
@@ -218,21 +294,23 @@ def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False,
             if not public or func_name in skip_items + ReduceSettings._exclude_public_method_names:
                 continue
 
-        func_data = reduce_data.functions[func_name]
-        func_data.encode = "f" + str(__FUNCTION_INDEX)
+        function_names.append(func_name)
 
-        for i, word in enumerate(search_words):
-            if word == func_name:
-                search_words[i] = func_data.encode
+    function_encodes = __allocate_indexes(function_names, occurrences, "f", __FUNCTION_INDEX, relocatable)
 
-        __FUNCTION_INDEX += 1
+    for func_name, func_encode in function_encodes.items():
+        reduce_data.functions[func_name].encode = func_encode
+        __rename_occurrences(occurrences, renames, func_name, func_encode)
+
+    __FUNCTION_INDEX += len(function_encodes)
 
     #
     # Replace public method names
     #
     if public:
 
-        public_method_names = {}
+        allocator = NameAllocator(iter_index_names("mp"))
+        public_methods = []
 
         # the methods with the same name across classes must be renamed equally. Ex:
         #
@@ -245,65 +323,55 @@ def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False,
 
                 if not method_name.startswith("__") and \
                         method_name not in ReduceSettings._exclude_public_method_names and \
-                        method_name not in public_method_names.keys() and \
                         method_name not in skip_items:
-                    encode = "mp{}".format(len(public_method_names))
-                    public_method_names[method_name] = encode
-                    method_data.encode = encode
-
-        for i, word in enumerate(search_words):
+                    public_methods.append(method_data)
 
-            prev1_char = __get_previous_char(search_words, i, 1)
+                    if len(public_methods) == 1 or \
+                            method_name not in (method.name for method in public_methods[:-1]):
+                        allocator.add(method_name, len(occurrences.get(method_name, ())))
 
-            if word == "(" and prev1_char in public_method_names.keys():
-                # replace at the definition:  method(){}
-
-                if prev1_char in public_function_names:
-                    reduce_data.add_error("Warning, public method name same as public function={}".format(prev1_char))
-                    continue
+        public_method_names = allocator.allocate()
 
-                encode = public_method_names[prev1_char]
+        for method_data in public_methods:
+            method_data.encode = public_method_names[method_data.name]
 
-                replaced, search_words = __replace_previous_char(search_words, prev1_char, encode, i - 1)
+        for method_name, encode in public_method_names.items():
+            for i in occurrences.get(method_name, ()):
 
-                if not replaced:
-                    reduce_data.add_error("Error replacing public method name. {}:{}".format(prev1_char, encode))
-
-
-
-
-            elif prev1_char == "." and word in public_method_names.keys():
+                # replace at the definition:  method(){}
                 # replace when accessed:  class_obj.method
+                if i in renames or (__get_non_empty_next_chars(search_words, links, i, 1) != ["("] and
+                                    __get_previous_char(search_words, links, i) != "."):
+                    continue
 
-                if word in public_function_names:
-                    reduce_data.add_error("Warning, public method name same as public function={}".format(word))
+                if method_name in public_function_names:
+                    reduce_data.add_error("Warning, public method name same as public function={}".format(method_name))
                     continue
 
-                encode = public_method_names[word]
-                search_words[i] = encode
+                renames[i] = encode
 
     # Replace class names
     if public:
 
-        for class_name, class_data in reduce_data.classes.items():
-
-            if class_name not in skip_items:
-
-                __CLASS_INDEX += 1
-
-                class_encode = "CL{}".format(__CLASS_INDEX)
-
-                class_data.encode = class_encode
+        class_names = [class_name for class_name in reduce_data.classes.keys() if class_name not in skip_items]
+        class_encodes = __allocate_indexes(class_names, occurrences, "CL", __CLASS_INDEX + 1, relocatable)
 
-                for i, word in enumerate(search_words):
+        for class_name, class_encode in class_encodes.items():
+            reduce_data.classes[class_name].encode = class_encode
+            __rename_occurrences(occurrences, renames, class_name, class_encode)
 
-                    if word == class_name:
-                        search_words[i] = class_encode
+        __CLASS_INDEX += len(class_encodes)
 
     # END
     #
 
-    reduced_text = "".join(char for char in search_words)
+    reduced_words = [renames.get(i, word) for i, word in enumerate(search_words)]
+    scopes_dictionary = ""
+
+    if scopes:
+        reduced_words, scopes_dictionary = reduce_scopes(reduced_words, skip_items)
+
+    reduced_text = "".join(reduced_words)
 
     end_size = sys.getsizeof(reduced_text)
 
@@ -319,83 +387,157 @@ def reduce_js(text, vars_on_functions=True, vars_on_methods=True, public=False,
 
         exit(1)
 
-    return reduced_text, str(reduce_data)
+    return reduced_text, str(reduce_data) + scopes_dictionary
+
+
+def __encode_index(prefix, index, relocatable):
+    if relocatable:
+        return prefix + ReduceSettings._relocation_mark + str(index) + ReduceSettings._relocation_mark
+
+    return prefix + str(index)
 
 
-def __replace_previous_char(search_list, match_item, value, start):
+def __allocate_indexes(names, occurrences, prefix, first_index, relocatable):
     """
-        This will find a string in a list and replace it.
-        This function is used for replace values when the exact index may not be known. ExL
-             __get_previous_char
-            do not give an index, because it excludes spaces.
+        Return the encode of each name, the most used names getting the lowest indexes.
     """
 
-    while start >= 0:
-        if search_list[start] == match_item:
-            search_list[start] = value
-            return True, search_list
-        else:
-            start -= 1
+    allocator = NameAllocator(__encode_index(prefix, index, relocatable) for index in itertools.count(first_index))
+
+    for name in names:
+        allocator.add(name, len(occurrences.get(name, ())))
+
+    return allocator.allocate()
+
+
+def __get_word_links(search_list):
+    """
+        Return the positions of the previous and of the next significant word (not a
+        whitespace or a comment) of each word: -1 or len(search_list) if there is none.
+
+        They are built once per list, so the lookups do not walk over the blanks. They
+        stay valid when the words are renamed, since a name replaces a name.
+    """
+
+    significant = [not __is_blank(word) for word in search_list]
+    previous_links = [-1] * len(search_list)
+    next_links = [len(search_list)] * len(search_list)
+
+    previous_index = -1
+    for i in range(len(search_list)):
+        previous_links[i] = previous_index
+
+        if significant[i]:
+            previous_index = i
+
+    next_index = len(search_list)
+    for i in range(len(search_list) - 1, -1, -1):
+        next_links[i] = next_index
+
+        if significant[i]:
+            next_index = i
+
+    return previous_links, next_links
+
+
+def __get_taken_names(search_list):
+    """
+        Return the names found in the words, the strings, templates and comments
+        included, which the renamed local names must not shadow.
+    """
+
+    return set(ReduceSettings._re_name.findall("".join(search_list)))
+
+
+def __get_word_occurrences(search_list):
+    """
+        Return the positions of each significant word, built in a single pass.
+    """
+
+    occurrences = {}
+
+    for i, word in enumerate(search_list):
+        if not __is_blank(word):
+            occurrences.setdefault(word, []).append(i)
 
-    return False, search_list
+    return occurrences
 
 
-def __get_previous_char(search_list, start, x=1):
+def __rename_occurrences(occurrences, renames, name, encode):
+    """
+        Add the renames of a name, except at the positions already renamed.
+    """
+
+    for i in occurrences.get(name, ()):
+        if i not in renames:
+            renames[i] = encode
+
+
+def __get_previous_char(search_list, links, start, x=1):
     """
         return a list (or word if x=1) X places in the list excluding spaces
     """
 
-    final_char = ""
-    index = start  # -1 at the beginning of the loop
+    previous_links = links[0]
+    index = start
     chars = []
 
     while len(chars) < x:
 
-        index -= 1
+        index = previous_links[index]
 
-        try:
-            previous_char = search_list[index]
-        except IndexError:
+        if index < 0:
             break
 
-        if previous_char.strip() != "":
-            chars.append(previous_char)
-            final_char = previous_char
+        chars.append(search_list[index])
 
     if x == 1:
-        return final_char
+        return chars[0] if len(chars) > 0 else ""
     else:
+        # at the beginning of the list, the missing chars are empty
+        chars += [""] * (x - len(chars))
         chars.reverse()
         return chars
 
 
-def __get_non_empty_next_chars(search_list, start, chars_nb):
-    chars = []
+def __is_blank(word):
+    """
+        Return True for the whitespaces and the comments, which are skipped when
+        looking for the previous or next chars.
+    """
+    return word.strip() == "" or word.startswith(("//", "/*"))
+
 
+def __get_non_empty_next_chars(search_list, links, start, chars_nb):
+
+    next_links = links[1]
     index = start
+    chars = []
 
     while len(chars) < chars_nb:
 
-        index += 1
+        index = next_links[index]
 
-        try:
-            current_char = search_list[index]
-        except IndexError:
+        if index >= len(search_list):
             break
 
-        if current_char.strip() != "":
-            chars.append(current_char)
+        chars.append(search_list[index])
 
     return chars
 
 
-def __reduce_function_block(function_words, func_name, reduce_data, class_name=None):
+def __reduce_function_block(function_words, func_name, reduce_data, class_name=None, rename_locals=True,
+                            taken_names=frozenset()):
     """
         Rename the content inside a function or a method:
             + arguments
             + variables (const, let, var)
 
         inside functions are excluded.
+
+        taken_names:
+            The names of the whole file (see `__get_taken_names`), which the local names
+            can not get: a global or a local of a nested function could be shadowed.
     """
     global __FUNCTION_INDEX
 
@@ -406,6 +548,9 @@ def __reduce_function_block(function_words, func_name, reduce_data, class_name=N
         else:
             reduce_data.add_function(func_name, None)
 
+    if not rename_locals:
+        return function_words
+
     #
     # Find the arguments
     #
@@ -424,7 +569,8 @@ def __reduce_function_block(function_words, func_name, reduce_data, class_name=N
             if char == ")":
                 break
 
-            args_header += char
+            if not __is_blank(char):
+                args_header += char
 
     for char in args_header.split(","):
 
@@ -446,12 +592,13 @@ def __reduce_function_block(function_words, func_name, reduce_data, class_name=N
     #
     consts = []
     lets = []
+    links = __get_word_links(function_words)
 
     for i, char in enumerate(function_words):
 
-        previous_char = __get_previous_char(function_words, i)
+        previous_char = __get_previous_char(function_words, links, i)
 
-        if len(char.strip()) >= ReduceSettings._min_var_replacement_len:
+        if not __is_blank(char) and len(char) >= ReduceSettings._min_var_replacement_len:
 
             if previous_char == "var":
                 if class_name is None:
@@ -488,16 +635,45 @@ def __reduce_function_block(function_words, func_name, reduce_data, class_name=N
         constants = reduce_data.get_method_constants(class_name, func_name)
         lets = reduce_data.get_method_lets(class_name, func_name)
 
+    occurrences = __get_word_occurrences(function_words)
+    object_keys, shorthands = get_object_keys(function_words)
+    renames = {}
+
+    # the most used names get the shortest names
+    allocator = NameAllocator(iter_short_names(), taken_names)
+
+    counted_names = set()  # a name declared twice (ex: an argument and a var) is counted once
+
+    for replace_list in (arguments, variables, constants, lets):
+        for arg_name in replace_list.keys():
+            if arg_name not in counted_names:
+                counted_names.add(arg_name)
+                allocator.add(arg_name, len(occurrences.get(arg_name, ())))
+
+    local_names = allocator.allocate()
+
+    for replace_list in (arguments, variables, constants, lets):
+        for arg_name in replace_list.keys():
+            replace_list[arg_name] = local_names[arg_name]
+
     for replace_list in (arguments, variables, constants, lets):
 
         for arg_name, arg_encode in replace_list.items():
 
-            for j, char in enumerate(function_words):
+            for j in occurrences.get(arg_name, ()):
+
+                previous_char = __get_previous_char(function_words, links, j)
+
+                if j in renames or previous_char == "." or j in object_keys:  # a property, or {key: value}
+                    continue
 
-                previous_char = __get_previous_char(function_words, j)
+                if j in shorthands:
+                    renames[j] = "{}:{}".format(arg_name, arg_encode)  # {name} --> {name:a1}
+                else:
+                    renames[j] = arg_encode
 
-                if char == arg_name and not previous_char == ".":  # previous_char == ".", is a property
-                    function_words[j] = arg_encode
+    for j, arg_encode in renames.items():
+        function_words[j] = arg_encode
 
     # Debug INFO
     #
@@ -508,7 +684,7 @@ def __reduce_function_block(function_words, func_name, reduce_data, class_name=N
     return function_words
 
 
-def __reduce_js_on_class(search_words, reduce_data, replace_method_names=False):
+def __reduce_js_on_class(search_words, reduce_data, replace_method_names=False, rename_locals=True):
     """
         Iterate to find classes, then find methods inside classes and do the work:
 
@@ -534,6 +710,9 @@ def __reduce_js_on_class(search_words, reduce_data, replace_method_names=False):
     possible_method_name = ""
     current_sequence = ""
 
+    links = __get_word_links(search_words)
+    taken_names = frozenset() if replace_method_names or not rename_locals else __get_taken_names(search_words)
+
     for i, word in enumerate(search_words):
 
         if word == "class" and class_tag is False:
@@ -561,7 +740,7 @@ def __reduce_js_on_class(search_words, reduce_data, replace_method_names=False):
         #
         if possible_class_name == "":
 
-            if word.strip() == "":
+            if __is_blank(word):
                 pass
             elif not word.isalnum():
                 class_tag = False
@@ -572,7 +751,7 @@ def __reduce_js_on_class(search_words, reduce_data, replace_method_names=False):
             continue
 
         # this is to remove comments containing the word class
-        if not word.strip() in ("{", "") and class_accolade_levels == -1:
+        if word != "{" and not __is_blank(word) and class_accolade_levels == -1:
             class_tag = False
             possible_class_name = ""
 
@@ -631,7 +810,7 @@ def __reduce_js_on_class(search_words, reduce_data, replace_method_names=False):
                 elif word in replace_properties.keys():
                     # Replace method properties
                     #
-                    previous_chars = __get_previous_char(search_words, i, 2)
+                    previous_chars = __get_previous_char(search_words, links, i, 2)
 
                     if len(previous_chars) == 2:
 
@@ -646,7 +825,7 @@ def __reduce_js_on_class(search_words, reduce_data, replace_method_names=False):
         #
 
         if word in ("self", "this"):  # this.prop = "toto"
-            next_chars = __get_non_empty_next_chars(search_words, i, 3)
+            next_chars = __get_non_empty_next_chars(search_words, links, i, 3)
 
             if len(next_chars) == 3 and \
                     next_chars[0] == "." and \
@@ -660,7 +839,7 @@ def __reduce_js_on_class(search_words, reduce_data, replace_method_names=False):
 
         # Start to detect the method
 
-        if not word.strip() in ("", "(") and current_sequence == "":
+        if word != "(" and not __is_blank(word) and current_sequence == "":
             possible_method_name = word
 
         if word in ("(", ")", "{") and inside_method is False:
@@ -719,7 +898,7 @@ def __reduce_js_on_class(search_words, reduce_data, replace_method_names=False):
                 inside_method = False
 
                 function_block = __reduce_function_block(method_words, possible_method_name, reduce_data,
-                                                         possible_class_name)
+                                                         possible_class_name, rename_locals, taken_names)
 
                 if ReduceSettings._debug:
                     function_block = ["\n\n// METHOD //\n"] + function_block + ["\n// END METHOD //\n\n"]
@@ -732,11 +911,13 @@ def __reduce_js_on_class(search_words, reduce_data, replace_method_names=False):
     return new_words
 
 
-def __reduce_js_on_functions(search_words, reduce_data):
+def __reduce_js_on_functions(search_words, reduce_data, rename_locals=True):
     function_block = []
     new_words = []
     bracket_level = 0
     inside_function = False
+    links = __get_word_links(search_words)
+    taken_names = __get_taken_names(search_words) if rename_locals else frozenset()
 
     for i, char in enumerate(search_words):
 
@@ -746,11 +927,11 @@ def __reduce_js_on_functions(search_words, reduce_data):
             # exclude:
             # toto = function(){}
 
-            previous_char = __get_previous_char(search_words, i)
+            previous_char = __get_previous_char(search_words, links, i)
 
             if previous_char != "=":  # to exclude functions inside functions or methods
 
-                chars = __get_non_empty_next_chars(search_words, i, 2)
+                chars = __get_non_empty_next_chars(search_words, links, i, 2)
 
                 if len(chars) == 2 and chars[0].replace("_", "").isalnum() and chars[1] == "(":
                     function_name = chars[0]
@@ -765,18 +946,19 @@ def __reduce_js_on_functions(search_words, reduce_data):
 
         elif inside_function:
 
-            if bracket_open:
-                pass
-            elif "{" in char:
+            if char == "{":
                 bracket_open = True
+                bracket_level += 1
+
+            elif char == "}":
+                bracket_level -= 1
 
-            bracket_level += char.count("{")
-            bracket_level -= char.count("}")
             function_block.append(char)
 
             if bracket_level <= 0 and bracket_open:
 
-                function_block = __reduce_function_block(function_block, function_name, reduce_data)
+                function_block = __reduce_function_block(function_block, function_name, reduce_data,
+                                                         rename_locals=rename_locals, taken_names=taken_names)
 
                 if ReduceSettings._debug:
                     function_block = ["\n\n// FUNCTION //\n"] + function_block + ["\n// END FUNCTION //\n\n"]
@@ -793,105 +975,3 @@ def __reduce_js_on_functions(search_words, reduce_data):
             new_words.append(char)
 
     return new_words
-
-
-def __join_text_comments(search_words):
-    """
-       Join the comments into a single word. This avoids bugs with the "-" sign
-       when it is used inside JS for defining classes ex "window-big"
-    """
-
-    #
-    # Join single line comments like regex patterns:  /'/g
-    #
-
-    for single_comment in ReduceSettings._single_line_comments:
-
-        comment_list = list(single_comment)
-        comment_length = len(comment_list)
-
-        new_words = []
-
-        debug_index = []
-
-        i = 0
-        while i < len(search_words):
-
-            # print(i, "---", search_words[i])
-
-            try:
-                chars = search_words[i:i + comment_length]
-            except IndexError:
-                chars = []
-
-            if chars == comment_list:
-                new_words.append(single_comment)
-                debug_index.append(len(new_words))
-                i += comment_length
-
-            else:
-                new_words.append(search_words[i])
-
-                i += 1
-
-        search_words = new_words
-
-    #
-    #
-
-    new_words = []
-    buffer = []
-    delimiter = None
-
-    for i, word in enumerate(search_words):
-
-        if len(buffer) == 0:
-            if word.startswith("'"):
-                delimiter = "'"
-
-            elif word.startswith('"'):
-                delimiter = '"'
-
-            elif delimiter is not None:
-                delimiter = None
-
-        if delimiter is None:
-            new_words.append(word)
-
-        elif word.startswith(delimiter) and len(buffer) == 0:
-
-            if (word != delimiter and word.endswith(
-                    delimiter)) or word == delimiter + delimiter:  # ex:  "hello" (in a single word)
-                new_words.append(word)
-                delimiter = None
-
-                if ReduceSettings._debug:
-                    print("WORD ", word)
-            else:
-                buffer.append(word)  # the comment is split
-
-
-
-        elif word.endswith(delimiter) and len(buffer) > 0:
-
-            buffer.append(word)
-            text = "".join(char for char in buffer)
-
-            if ReduceSettings._debug:
-                print("JOINED TEXT", text)
-            elif "\n" in text:
-                print("WARNING: JOINED TEXT", text)
-
-            buffer = []
-            delimiter = None
-            new_words.append(text)
-
-
-        elif len(buffer) > 0:
-            buffer.append(word)
-
-        else:
-            new_words.append(word)
-
-    return new_words
-
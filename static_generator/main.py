@@ -19,23 +19,41 @@
 import re
 import os
 import sys
+import gzip
 import json
 import shutil
+import time
+import cProfile
 import hashlib
 import subprocess
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Literal
+from importlib import metadata
 from base64 import b64encode
 from datetime import datetime
 
 from jsmin import jsmin
 from cssmin import cssmin
 
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from static_generator.JSEncoder.main import reduce_js
+from static_generator.JSEncoder.main import reduce_js, relocate_js, get_reduce_indexes, set_reduce_indexes
 
 __version__ = "25.06.21.1"
 
+__worker_include_cache = None
+
 class CompressConstants:
     _file_extension = ".comp"
     _info_tag = "@GENERATION_INFO"  # to be avoided if using the HTML5 integrity value (because of the datetime-hour)
@@ -44,6 +62,439 @@ class CompressConstants:
     _include = "include:"
     _static_path = "STATIC_PATH/" # the slash is important
     _reduce_public_js_except = "reducePublicJSExcept:"
+    _cache_extension = ".json"
+    _integrity_cache_name = "integrity.json"
+    _git_versioning = "git_versioning"
+    _re_placeholder = re.compile(r"\{\{(git_versioning|[^{}\s]+\.(?:integrity|static))\}\}")
+    _minified_extensions = (".min.js", ".min.css")
+    _watch_poll_interval = 0.5 # seconds between two scans, when inotify is not available
+    _watch_delay = 0.05 # seconds to wait for the other events of a change (ex: an editor saving many files)
+    _precompress_extensions = {"gz": ".gz", "br": ".br"}
+    _re_cache_key = re.compile(r"[0-9a-f]{64}") # the names of the build cache entries (not integrity.json)
+
+class BuildCache:
+    """
+        Content-addressed cache of the compressed bundles, stored between the builds.
+        A bundle is stored under the digest of its inputs (see `get_key`), so any
+        change of the .comp file, of an included file or of an option creates a new
+        entry. The entries not used by a build are removed at its end (see `prune`).
+
+        The reduced bundles are stored relocatable (see `reduce_js`), so they do not
+        depend on the bundles compressed before them. The keys include the digest of
+        the encoder (see `get_encoder_digest`), so a new JSEncoder, jsmin or cssmin
+        does not give the bundles of the previous one.
+    """
+
+    _encoder_digest = None
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def get_encoder_digest() -> str:
+        """
+            Return the digest of the code that writes the bundles: the sources of this
+            file and of JSEncoder, and the versions of jsmin & cssmin. It is computed
+            once per process.
+        """
+
+        if BuildCache._encoder_digest is None:
+            source_dir = os.path.dirname(os.path.abspath(__file__))
+            encoder_dir = os.path.join(source_dir, "JSEncoder")
+            source_paths = [os.path.abspath(__file__)] + \
+                           sorted(os.path.join(encoder_dir, name) for name in os.listdir(encoder_dir)
+                                  if name.endswith(".py"))
+
+            digest = hashlib.sha256()
+
+            for package_name in ("jsmin", "cssmin"):
+                try:
+                    package_version = metadata.version(package_name)
+                except metadata.PackageNotFoundError:
+                    package_version = ""
+
+                digest.update(f"{package_name}={package_version}".encode("utf-8") + b"\0")
+
+            for path in source_paths:
+                digest.update(os.path.relpath(path, source_dir).encode("utf-8") + b"\0")
+
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+
+                digest.update(b"\0")
+
+            BuildCache._encoder_digest = digest.hexdigest()
+
+        return BuildCache._encoder_digest
+
+    @staticmethod
+    def get_key(paths: list[str], options: dict) -> str:
+        """
+            Return the digest of the files (the .comp file and its dependencies), of
+            the options that change the output and of the encoder.
+        """
+
+        digest = hashlib.sha256(json.dumps([__version__, BuildCache.get_encoder_digest(), options],
+                                           sort_keys=True).encode("utf-8"))
+
+        for path in paths:
+            digest.update(path.encode("utf-8") + b"\0")
+
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+
+            digest.update(b"\0")
+
+        return digest.hexdigest()
+
+    def prune(self, keys: set[str]) -> int:
+        """
+            Remove the entries (and the temporary files left by an interrupted build)
+            whose key is not in `keys`, and return their number.
+        """
+
+        removed = 0
+
+        for file_name in os.listdir(self.cache_dir):
+            key, extension = os.path.splitext(file_name)
+
+            if extension == ".tmp":
+                key, extension = os.path.splitext(key)
+
+            if extension != CompressConstants._cache_extension or key in keys or \
+               not CompressConstants._re_cache_key.fullmatch(key):
+                continue
+
+            os.remove(os.path.join(self.cache_dir, file_name))
+            removed += 1
+
+        return removed
+
+    def get(self, key: str) -> None | tuple[str, str, tuple[int, int, int]]:
+        """
+            Return the (file data, encode dictionary, used reduce indexes) of a bundle,
+            or None if the key is not in the cache.
+        """
+
+        try:
+            with open(os.path.join(self.cache_dir, key + CompressConstants._cache_extension), "r") as f:
+                entry = json.load(f)
+
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        return entry["file_data"], entry["encode_dictionary"], tuple(entry["used_indexes"])
+
+    def set(self, key: str, file_data: str, encode_dictionary: str, used_indexes: tuple[int, int, int]):
+
+        cache_path = os.path.join(self.cache_dir, key + CompressConstants._cache_extension)
+
+        with open(cache_path + ".tmp", "w") as f:
+            json.dump({"file_data": file_data,
+                       "encode_dictionary": encode_dictionary,
+                       "used_indexes": used_indexes}, f)
+
+        os.replace(cache_path + ".tmp", cache_path)
+
+class IncludeCache:
+    """
+        Memo of the included files, once read and minified (see `__get_comp_data`).
+        The entries are keyed by path and minify mode, and used while the file keeps
+        the same stamp (mtime & size) and the encoder is the same (see
+        `BuildCache.get_encoder_digest`), so each file shared by many bundles is read
+        and minified only once per build. If a `cache_dir` is given, the entries are
+        also stored there between the builds, under the digest of their key: a changed
+        file or encoder replaces the entry, so the cache does not grow with the edits.
+    """
+
+    def __init__(self, cache_dir: None | str = None):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self.__data = {}
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __reduce__(self):
+        # The workers start with an empty memo
+        return self.__class__, (self.cache_dir,)
+
+    def get(self, key: tuple, stamp: list[int]) -> None | str | list[str]:
+
+        stamp = [BuildCache.get_encoder_digest()] + stamp
+        entry = self.__data.get(key)
+
+        if (entry is None or entry["stamp"] != stamp) and self.cache_dir is not None:
+            try:
+                with open(self.__get_cache_path(key), "r") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                pass
+            else:
+                self.__data[key] = entry
+
+        if entry is None or entry["stamp"] != stamp:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        return entry["data"]
+
+    def set(self, key: tuple, stamp: list[int], data: str | list[str]):
+
+        entry = {"stamp": [BuildCache.get_encoder_digest()] + stamp, "data": data}
+        self.__data[key] = entry
+
+        if self.cache_dir is not None:
+            cache_path = self.__get_cache_path(key)
+
+            with open(cache_path + f".{os.getpid()}.tmp", "w") as f:
+                json.dump(entry, f)
+
+            os.replace(cache_path + f".{os.getpid()}.tmp", cache_path)
+
+    def __get_cache_path(self, key: tuple) -> str:
+        digest = hashlib.sha256(json.dumps([__version__, key]).encode("utf-8"))
+        return os.path.join(self.cache_dir, digest.hexdigest() + CompressConstants._cache_extension)
+
+class IntegrityCache:
+    """
+        SHA-384 of the already minified files, stored between the builds. An entry is
+        used while its file keeps the same size, modification time and inode, so the
+        large vendor files are only hashed again when they change.
+    """
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+        self.__entries = {} # path: [size, mtime_ns, inode, hash]
+        self.__used_paths = set()
+
+        try:
+            with open(cache_path, "r") as f:
+                self.__entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def get_key(file_stat: os.stat_result) -> list[int]:
+        return [file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino]
+
+    def get(self, path: str, file_stat: os.stat_result) -> None | str:
+        """
+            Return the hash of the file, or None if it is not in the cache or it changed.
+        """
+
+        entry = self.__entries.get(path)
+
+        if entry is None or entry[:3] != self.get_key(file_stat):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.__used_paths.add(path)
+
+        return entry[3]
+
+    def set(self, path: str, file_stat: os.stat_result, file_hash: str):
+        self.__entries[path] = self.get_key(file_stat) + [file_hash]
+        self.__used_paths.add(path)
+
+    def remove(self, path: str):
+        self.__entries.pop(path, None)
+        self.__used_paths.discard(path)
+
+    def save(self):
+        """
+            Write the entries of the files used by the build (the others are dropped).
+        """
+
+        with open(self.cache_path + ".tmp", "w") as f:
+            json.dump({path: self.__entries[path] for path in sorted(self.__used_paths)}, f)
+
+        os.replace(self.cache_path + ".tmp", self.cache_path)
+
+class FileIndex:
+    """
+        Inventory of the input files, built by a single scan of the static & templates
+        directories and shared by all the stages of a build. The excluded paths are
+        matched by one precompiled pattern, and the excluded directories are not scanned.
+    """
+
+    def __init__(self, static_dir: str, templates_dir: str, exclude_paths: list[str]):
+        self.comp_paths = [] # .comp files of the static directory
+        self.minified_paths = [] # already minified files of the static directory
+        self.template_paths = [] # .comp.html files of the templates directory
+
+        if len(exclude_paths) > 0:
+            self.__re_exclude = re.compile("|".join(re.escape(exclude_path) for exclude_path in exclude_paths))
+        else:
+            self.__re_exclude = None
+
+        for path in self.__scan(static_dir):
+            if path.endswith(CompressConstants._file_extension):
+                self.comp_paths.append(path)
+
+            elif path.endswith(CompressConstants._minified_extensions):
+                self.minified_paths.append(path)
+
+        for path in self.__scan(templates_dir):
+            if path.endswith(CompressConstants._file_extension + ".html"):
+                self.template_paths.append(path)
+
+        self.comp_paths.sort()
+        self.minified_paths.sort()
+        self.template_paths.sort()
+
+    def is_excluded(self, path: str) -> bool:
+        """
+            Return True if the path contains one of the excluded paths.
+        """
+        return self.__re_exclude is not None and self.__re_exclude.search(path) is not None
+
+    def __scan(self, directory: str):
+        """
+            Yield the absolute paths of the files of the directory, and of its
+            sub-directories (the links to directories are not followed, like os.walk).
+        """
+
+        directories = [os.path.abspath(directory)]
+
+        while len(directories) > 0:
+            try:
+                entries = os.scandir(directories.pop())
+            except OSError:
+                continue
+
+            with entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        # all the files of an excluded directory are excluded
+                        if not entry.is_symlink() and not self.is_excluded(os.path.join(entry.path, "")):
+                            directories.append(entry.path)
+
+                    elif not self.is_excluded(entry.path):
+                        yield entry.path
+
+class BuildProfile:
+    """
+        Wall time, CPU time and sizes of the stages and of the bundles of a build (see
+        `run` with profile_path). The CPU times are the ones of the process doing the
+        work: the bundles compressed by the workers are measured in the workers, and
+        the stages in the main process.
+
+        The reduction ratio is the part of the bytes removed: 1 - bytes out / bytes in.
+
+        The bundles also have the wall & CPU times of their steps (see `step`): jsmin &
+        cssmin on the included files (0 when they come from the include cache),
+        reduce_js, the relocation of the reduced names and the hash of the output.
+    """
+
+    _steps = ("jsmin", "cssmin", "reduce", "relocate", "hash")
+
+    def __init__(self):
+        self.stages = {} # name: measures
+        self.bundles = {} # comp path: measures
+        self.__start_time = time.perf_counter()
+        self.__start_cpu_time = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+            Measure the stage, with a `with` block. The yielded dict stays in the
+            report, so its sizes may be set after the block.
+        """
+
+        measures = {"bytes_in": 0, "bytes_out": 0}
+        start_time = time.perf_counter()
+        start_cpu_time = time.process_time()
+
+        try:
+            yield measures
+        finally:
+            measures["wall_time"] = time.perf_counter() - start_time
+            measures["cpu_time"] = time.process_time() - start_cpu_time
+            self.stages[name] = measures
+
+    @staticmethod
+    def get_step_times() -> dict:
+        """
+            Return the times of the steps of a bundle, at 0.
+        """
+        return {f"{step}_{measure}": 0 for step in BuildProfile._steps for measure in ("wall_time", "cpu_time")}
+
+    @staticmethod
+    @contextmanager
+    def step(times: dict, name: str):
+        """
+            Add the wall & CPU times of the `with` block to the times of a step (see
+            `get_step_times`). A step can be measured many times for a bundle.
+        """
+
+        start_time = time.perf_counter()
+        start_cpu_time = time.process_time()
+
+        try:
+            yield
+        finally:
+            times[name + "_wall_time"] += time.perf_counter() - start_time
+            times[name + "_cpu_time"] += time.process_time() - start_cpu_time
+
+    def add_bundle(self, comp_path: str, measures: dict):
+        self.bundles[comp_path] = measures
+
+    def save(self, path: str, options: dict):
+
+        for measures in list(self.stages.values()) + list(self.bundles.values()):
+            if measures["bytes_in"] > 0 and measures["bytes_out"] > 0:
+                measures["reduction_ratio"] = 1 - measures["bytes_out"] / measures["bytes_in"]
+            else:
+                measures["reduction_ratio"] = None
+
+        report = {"version": __version__,
+                  "date": datetime.now().isoformat(),
+                  "options": options,
+                  "wall_time": time.perf_counter() - self.__start_time,
+                  "cpu_time": time.process_time() - self.__start_cpu_time,
+                  "stages": self.stages,
+                  "bundles": self.bundles}
+
+        with open(path, "w") as f:
+            json.dump(report, f, indent=4)
+
+class BuildState:
+    """
+        In-memory dependency graph of a build (see `run` with watch=True): the bundles
+        with their included files, the already minified files and the templates with
+        the placeholders they use. It allows to rebuild only what a change affects.
+    """
+
+    def __init__(self, options: dict):
+        self.options = options # arguments of `run`
+        self.reduce_indexes = get_reduce_indexes() # before the first bundle
+        self.map_dict = {}
+        self.include_cache = None
+        self.file_index = None
+        self.integrity_cache = None
+        self.dependencies = {} # comp path: included paths
+        self.bundles = {} # comp path: data returned by `__compress_bundle`
+        self.start_indexes = {} # comp path: reduce indexes before the bundle
+        self.outputs = {} # comp path: (map key, written paths)
+        self.minified = {} # minified path: map key
+        self.templates = {} # template path: (written path, placeholders)
+        self.written_map = {} # map entries of the templates, as last written (see `__rebuild`)
+        self.failed_paths = set() # changed paths of a failed rebuild, retried with the next change
 
 def run(static_dir: str,
                        templates_dir: str,
@@ -53,13 +504,21 @@ def run(static_dir: str,
                        exclude_paths: None | list[str],
                        minify: bool = True,
                        reduce: bool = True,
+                       reduce_scopes: bool = False,
                        versioning: None | Literal["md5", "git"] = "md5",
                        verbose: bool = True,
                        header_js: str = "",
                        header_css: str = "",
                        inline: bool = True,
                        clean: bool = True,
-                       keep_tree: bool = False):
+                       keep_tree: bool = False,
+                       cache_dir: None | str = None,
+                       workers: None | int = 1,
+                       watch: bool = False,
+                       precompress: None | list[Literal["gz", "br"]] = None,
+                       verify_integrity: bool = False,
+                       profile_path: None | str = None,
+                       cprofile_path: None | str = None):
     """
         versioning:
             In order to always update the JS & CSS, it is important to add a version
@@ -74,6 +533,55 @@ def run(static_dir: str,
                  JS & CSS files.
 
             None: will use the original file name.
+
+        reduce_scopes:
+            Rename the local names of the reduced JS by lexical scope (see `reduce_scopes`
+            of JSEncoder): the most used ones get the shortest names, and the sibling
+            scopes reuse them. It gives a smaller output than the default renaming of
+            the function locals. Requires reduce.
+
+        cache_dir:
+            Directory of the build cache (see `BuildCache`). The bundles whose .comp file,
+            included files and options did not change are loaded from it instead of
+            being compressed again. The minified includes and the hashes of the already
+            minified files are also stored there (see `IncludeCache` & `IntegrityCache`).
+            The bundle entries not used by the build are removed, and the bundles with
+            a @GENERATION_INFO tag are not cached (their time would be the cached one).
+            None to disable the cache.
+
+        verify_integrity:
+            Hash again the already minified files found in the integrity cache, and warn
+            about the ones that changed without changing their size, modification time
+            and inode. The new hashes are used.
+
+        profile_path:
+            Path of a JSON report with the wall time, CPU time, bytes in & out and
+            reduction ratio of each stage and of each bundle, and the times of the
+            jsmin, cssmin, reduce_js, relocation and hash steps of each bundle (see
+            `BuildProfile`). None to disable it.
+
+        cprofile_path:
+            Path of a cProfile dump of the build (ex: to read with pstats or snakeviz).
+            The bundles compressed by the workers are not in it, use workers=1. None to
+            disable it.
+
+        workers:
+            Number of processes compressing the bundles, None for all the CPUs. The
+            result is the same as the serial build (workers=1).
+
+        watch:
+            After the build, keep watching the .comp files, their included files, the
+            already minified files and the templates. On a change, only the affected
+            bundles and the templates that use their map keys are generated again.
+            It uses inotify if `inotify_simple` is installed, otherwise it scans the
+            modification times. Stop it with Ctrl+C.
+
+        precompress:
+            Encodings of the compressed copies written next to the generated bundles
+            and HTML files (ex: app.min.js.gz), for the gzip_static & brotli_static
+            options of nginx: "gz" (zlib, level 9) and "br" (requires the brotli
+            module). Their sizes are added to the map (gz_size, br_size). None to
+            disable it.
     """
 
     print(f"""\n[CONFIGURATION]
@@ -81,6 +589,7 @@ def run(static_dir: str,
 version={__version__}: 
 minify={minify}
 reduce={reduce}
+reduce_scopes={reduce_scopes}
 versioning={versioning}
 verbose={verbose}
 exclude_paths={exclude_paths}
@@ -90,6 +599,13 @@ map_file_name={map_file_name}
 integrity_key_removal={integrity_key_removal}
 inline="{inline}"
 keep_tree={keep_tree}
+cache_dir={cache_dir}
+workers={workers}
+watch={watch}
+precompress={precompress}
+verify_integrity={verify_integrity}
+profile_path={profile_path}
+cprofile_path={cprofile_path}
 generation_dir={generation_dir}
 header_css={header_css}
 header_js={header_js}""")
@@ -108,6 +624,17 @@ header_js={header_js}""")
     if exclude_paths is None:
         exclude_paths = []
 
+    if precompress is None:
+        precompress = []
+
+    for encoding in precompress:
+        if encoding not in CompressConstants._precompress_extensions:
+            raise ValueError(f"Error: the only values that can be accepted for precompress are: "
+                             f"{', '.join(CompressConstants._precompress_extensions)}, not {encoding}")
+
+    if "br" in precompress and brotli is None:
+        print("[Warning] the brotli module is not installed, the .br files will not be written")
+        precompress = [encoding for encoding in precompress if encoding != "br"]
 
     if clean:
         print("\n[CLEANING GENERATION DIRECTORY]\n")
@@ -119,57 +646,186 @@ header_js={header_js}""")
     #
     # Integrity dict
     #
-    map_dict = {}
+    if watch:
+        state = BuildState({"static_dir": static_dir,
+                            "templates_dir": templates_dir,
+                            "generation_dir": generation_dir,
+                            "map_file_name": map_file_name,
+                            "integrity_key_removal": integrity_key_removal,
+                            "exclude_paths": exclude_paths,
+                            "minify": minify,
+                            "reduce": reduce,
+                            "reduce_scopes": reduce_scopes,
+                            "versioning": versioning,
+                            "git_short_hash": git_short_hash,
+                            "verbose": verbose,
+                            "header_js": header_js,
+                            "header_css": header_css,
+                            "inline": inline,
+                            "keep_tree": keep_tree,
+                            "precompress": precompress,
+                            "verify_integrity": verify_integrity})
+        map_dict = state.map_dict
+    else:
+        state = None
+        map_dict = {}
+
+    #
+    # Profiling
+    #
+    profile = None if profile_path is None else BuildProfile()
+
+    if cprofile_path is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    #
+    # Index the input files
+    #
+    with __profile_stage(profile, "index"):
+        file_index = FileIndex(static_dir, templates_dir, exclude_paths)
+
+    if state is not None:
+        state.file_index = file_index
 
     #
     # Excluded files
     #
-    __add_already_minified_files(static_dir=static_dir,
-                                 integrity_key_removal=integrity_key_removal,
-                                 verbose=verbose,
-                                 exclude_paths=exclude_paths,
-                                 map_dict=map_dict)
+    if cache_dir is None:
+        integrity_cache = None
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        integrity_cache = IntegrityCache(os.path.join(cache_dir, CompressConstants._integrity_cache_name))
+
+    with __profile_stage(profile, "minified") as stage:
+        __add_already_minified_files(integrity_key_removal=integrity_key_removal,
+                                     verbose=verbose,
+                                     file_index=file_index,
+                                     map_dict=map_dict,
+                                     integrity_cache=integrity_cache,
+                                     verify_integrity=verify_integrity,
+                                     state=state)
+
+    if profile is not None:
+        stage["bytes_in"] = __get_files_size(file_index.minified_paths)
 
     #
     # Compressing the files
     #
-    __compress_files(static_dir=static_dir,
-                     generation_dir=generation_dir,
-                     map_dict=map_dict,
-                     git_short_hash=git_short_hash,
-                     integrity_key_removal=integrity_key_removal,
-                     verbose=verbose,
-                     minify=minify,
-                     reduce=reduce,
-                     versioning=versioning,
-                     exclude_paths=exclude_paths,
-                     header_js = header_js,
-                     header_css = header_css,
-                     inline = inline)
+    with __profile_stage(profile, "bundles") as stage:
+        outputs = __compress_files(static_dir=static_dir,
+                                   generation_dir=generation_dir,
+                                   map_dict=map_dict,
+                                   git_short_hash=git_short_hash,
+                                   integrity_key_removal=integrity_key_removal,
+                                   verbose=verbose,
+                                   minify=minify,
+                                   reduce=reduce,
+                                   reduce_scopes=reduce_scopes,
+                                   versioning=versioning,
+                                   file_index=file_index,
+                                   header_js = header_js,
+                                   header_css = header_css,
+                                   inline = inline,
+                                   cache_dir = cache_dir,
+                                   workers = workers,
+                                   state = state,
+                                   profile = profile)
+
+    if profile is not None:
+        stage["bytes_in"] = sum(bundle["bytes_in"] for bundle in profile.bundles.values())
+        stage["bytes_out"] = sum(bundle["bytes_out"] for bundle in profile.bundles.values())
 
 
     #
     # Creating HARD STATIC pages
     #
-    __update_static_files(templates_dir=templates_dir,
-                          generation_dir=generation_dir,
-                          git_short_hash=git_short_hash,
-                          exclude_paths=exclude_paths,
-                          verbose=verbose,
-                          map_dict=map_dict,
-                          keep_tree=keep_tree)
+    with __profile_stage(profile, "templates") as stage:
+        static_paths = __update_static_files(templates_dir=templates_dir,
+                                             generation_dir=generation_dir,
+                                             git_short_hash=git_short_hash,
+                                             verbose=verbose,
+                                             map_dict=map_dict,
+                                             file_index=file_index,
+                                             keep_tree=keep_tree,
+                                             state=state)
+
+    if profile is not None:
+        stage["bytes_in"] = __get_files_size(file_index.template_paths)
+        stage["bytes_out"] = __get_files_size(static_paths)
+
+    #
+    # Compressed copies of the generated files
+    #
+    if len(precompress) > 0:
+        bundle_paths = [written_paths[0] for _, written_paths in outputs.values()]
 
+        with __profile_stage(profile, "precompress") as stage:
+            sidecar_paths = __precompress_files(bundle_paths + static_paths, precompress, map_dict, verbose)
+
+        if profile is not None:
+            stage["bytes_in"] = __get_files_size(bundle_paths + static_paths)
+            stage["bytes_out"] = __get_files_size([path for paths in sidecar_paths.values() for path in paths])
+
+        if state is not None:
+            for _, written_paths in state.outputs.values():
+                written_paths += sidecar_paths[written_paths[0]]
 
     #
     # Create the integrity file
     #
     if map_file_name is not None:
+        with __profile_stage(profile, "map") as stage:
+            __write_map_file(generation_dir, map_file_name, map_dict)
 
-        map_path = os.path.join(generation_dir, map_file_name)
-        with open(map_path, "w") as f:
-            f.write(json.dumps(map_dict, sort_keys=True, indent=4))
+        if profile is not None:
+            stage["bytes_out"] = __get_files_size([os.path.join(generation_dir, map_file_name)])
 
-        print("Generated MAP file:", map_path)
+    #
+    # Write the profiling reports
+    #
+    if cprofile_path is not None:
+        profiler.disable()
+        profiler.dump_stats(cprofile_path)
+        print("Generated cProfile file:", cprofile_path)
+
+    if profile is not None:
+        profile.save(profile_path, {"minify": minify,
+                                    "reduce": reduce,
+                                    "reduce_scopes": reduce_scopes,
+                                    "versioning": versioning,
+                                    "inline": inline,
+                                    "cache_dir": cache_dir,
+                                    "workers": workers,
+                                    "precompress": precompress})
+        print("Generated profile file:", profile_path)
+
+    if watch:
+        state.written_map = {key: dict(values) for key, values in map_dict.items()}
+        __watch(state)
+
+def __profile_stage(profile: None | BuildProfile, name: str):
+    """
+        Return the context measuring a stage of the build, which does nothing without profile.
+    """
+    return nullcontext({}) if profile is None else profile.stage(name)
+
+def __profile_step(times: None | dict, name: str):
+    """
+        Return the context measuring a step of a bundle, which does nothing without times.
+    """
+    return nullcontext() if times is None else BuildProfile.step(times, name)
+
+def __get_files_size(paths: list[str]) -> int:
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+def __write_map_file(generation_dir: str, map_file_name: str, map_dict: dict):
+
+    map_path = os.path.join(generation_dir, map_file_name)
+    with open(map_path, "w") as f:
+        f.write(json.dumps(map_dict, sort_keys=True, indent=4))
+
+    print("Generated MAP file:", map_path)
 
 def __get_git_revision_short_hash():
     return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD']).decode('ascii').strip()
@@ -186,15 +842,48 @@ def __path_from_line(line, tag, static_dir):
 
 def __test_include_path(comp_path, include_path):
     if not os.path.exists(include_path):
-        print(f"\nCritical Error: Non-Existent path '{include_path}' defined in '{comp_path}'")
-        sys.exit(1)
+        raise FileNotFoundError(f"Critical Error: Non-Existent path '{include_path}' defined in '{comp_path}'")
+
+def __get_comp_dependencies(comp_path: str, static_dir: str, test_paths: bool = True) -> list[str]:
+    """
+        Return the paths included by a .comp file. test_paths=False also returns the
+        ones that do not exist (ex: to watch them).
+    """
+
+    with open(comp_path, "r") as f:
+        template_lines = f.readlines()
+
+    dependencies = []
+
+    for line in template_lines:
+
+        line = line.replace("\n", "")
+
+        for tag in (CompressConstants._include_js, CompressConstants._include_css, CompressConstants._include):
+            if line.startswith(tag):
+                include_path = __path_from_line(line, tag, static_dir)
+
+                if test_paths:
+                    __test_include_path(comp_path, include_path)
+
+                dependencies.append(include_path)
+                break
+
+    return dependencies
+
+def __has_generation_info(comp_path: str) -> bool:
+    with open(comp_path, "r") as f:
+        return CompressConstants._info_tag in f.read()
 
 def __get_comp_data(comp_path: str,
                     static_dir: str,
                     verbose: bool,
                     minify: bool,
                     reduce: bool,
-                    inline: bool) -> (str, bool, list):
+                    inline: bool,
+                    include_cache: None | IncludeCache = None,
+                    times: None | dict = None,
+                    messages: None | list[str] = None) -> (str, bool, list):
 
     if verbose:
         print(" " + comp_path)
@@ -232,94 +921,185 @@ def __get_comp_data(comp_path: str,
 
             include_path = __path_from_line(line, CompressConstants._include_js, static_dir)
             __test_include_path(comp_path, include_path)
+            compressed_lines.append(__get_include_data(CompressConstants._include_js,
+                                                       include_path,
+                                                       minify,
+                                                       reduce,
+                                                       inline,
+                                                       include_cache,
+                                                       times,
+                                                       messages))
 
-            with open(include_path, 'r') as f:
-                data = f"/* {CompressConstants._include_js}{include_path} */\n" + f.read()
+        elif line.startswith(CompressConstants._include_css):
 
-            if minify:
-                compressed_data = jsmin(data)
+            include_path = __path_from_line(line, CompressConstants._include_css, static_dir)
+            __test_include_path(comp_path, include_path)
+            compressed_lines.append(__get_include_data(CompressConstants._include_css,
+                                                       include_path,
+                                                       minify,
+                                                       reduce,
+                                                       inline,
+                                                       include_cache,
+                                                       times,
+                                                       messages))
 
-            elif reduce:
-                compressed_data = __remove_comments(data)
-            else:
-                compressed_data = data
+        elif line.startswith(CompressConstants._include):
 
-            compressed_data = compressed_data.replace('"use strict";', "")
-            compressed_data = compressed_data.replace("'use strict';", "")
-            compressed_data = compressed_data.replace(';}', "}")
+            include_path = __path_from_line(line, CompressConstants._include, static_dir)
+            __test_include_path(comp_path, include_path)
+            compressed_lines += __get_include_data(CompressConstants._include,
+                                                   include_path,
+                                                   minify,
+                                                   reduce,
+                                                   inline,
+                                                   include_cache,
+                                                   times,
+                                                   messages)
 
-            if inline and not compressed_data.endswith(";"):
-                compressed_data += ";"
+        else:
 
-            compressed_lines.append(compressed_data)
+            if inline and line.strip() == "":
+                continue
 
-            if minify and len(compressed_data.split("\n")) > 1:
-                print("[Info] multiple lines compressing", include_path)
-                for c_line in compressed_data.split("\n"):
-                    print("\t" + c_line[:50])
+            compressed_lines.append(line)
 
+    if inline:
+        file_data = "".join(compressed_lines)
+    else:
+        file_data = "\n".join(compressed_lines)
 
-        elif line.startswith(CompressConstants._include_css):
+    return file_data, reduce_public_js, reduce_public_js_except
 
-            include_path = __path_from_line(line, CompressConstants._include_css, static_dir)
-            __test_include_path(comp_path, include_path)
 
-            with open(include_path, 'r') as f:
-                data = f"/* {CompressConstants._include_css}{include_path} */\n" + f.read()
+def __get_include_data(tag: str,
+                       include_path: str,
+                       minify: bool,
+                       reduce: bool,
+                       inline: bool,
+                       include_cache: None | IncludeCache,
+                       times: None | dict = None,
+                       messages: None | list[str] = None) -> str | list[str]:
+    """
+        Return the data of an included file, as it is added to the bundles: a
+        string for includeJS: & includeCSS:, and the list of lines for include:.
+        The info about the JS kept on many lines is given on each use, even
+        when the data comes from the cache (see `__print_message`).
+    """
 
-            if minify:
-                compressed_data = cssmin(data)
-            else:
-                compressed_data = data
+    if include_cache is None:
+        data = __read_include_data(tag, include_path, minify, reduce, inline, times)
 
-            # comp_css = cssmin(sys.stdin.read(), wrap=options.wrap)
-            compressed_data = compressed_data.replace("+", " + ").replace("  ", " ")
-            compressed_data = compressed_data.replace('opacity:0', 'opacity: 0')
+    else:
+        file_stat = os.stat(include_path)
+        key = (tag, include_path, minify, reduce, inline)
+        stamp = [file_stat.st_mtime_ns, file_stat.st_size]
 
-            compressed_lines.append(compressed_data)
+        data = include_cache.get(key, stamp)
 
+        if data is None:
+            data = __read_include_data(tag, include_path, minify, reduce, inline, times)
+            include_cache.set(key, stamp, data)
 
-        elif line.startswith(CompressConstants._include):
+    if tag == CompressConstants._include_js and minify and len(data.split("\n")) > 1:
+        __print_message(messages,
+                        "\n".join([f"[Info] multiple lines compressing {include_path}"] +
+                                  ["\t" + c_line[:50] for c_line in data.split("\n")]))
 
-            include_path = __path_from_line(line, CompressConstants._include, static_dir)
-            __test_include_path(comp_path, include_path)
+    return data
 
-            with open(include_path, 'r') as f:
-                read_lines = f.readlines()
+def __print_message(messages: None | list[str], message: str):
+    """
+        Print the message, or add it to the messages of a bundle, printed by the main
+        process in the order of the bundles (the workers would mix their outputs).
+    """
+
+    if messages is None:
+        print(message)
+    else:
+        messages.append(message)
 
-            for read_line in read_lines:
-                compressed_lines.append(read_line)
+def __read_include_data(tag: str,
+                        include_path: str,
+                        minify: bool,
+                        reduce: bool,
+                        inline: bool,
+                        times: None | dict = None) -> str | list[str]:
 
+    if tag == CompressConstants._include_js:
+
+        with open(include_path, 'r') as f:
+            data = f"/* {CompressConstants._include_js}{include_path} */\n" + f.read()
+
+        if minify:
+            with __profile_step(times, "jsmin"):
+                compressed_data = jsmin(data)
+
+        elif reduce:
+            compressed_data = __remove_comments(data)
         else:
+            compressed_data = data
 
-            if inline and line.strip() == "":
-                continue
+        compressed_data = compressed_data.replace('"use strict";', "")
+        compressed_data = compressed_data.replace("'use strict';", "")
+        compressed_data = compressed_data.replace(';}', "}")
 
-            compressed_lines.append(line)
+        if inline and not compressed_data.endswith(";"):
+            compressed_data += ";"
 
-    if inline:
-        file_data = "".join(compressed_lines)
-    else:
-        file_data = "\n".join(compressed_lines)
+        return compressed_data
 
-    return file_data, reduce_public_js, reduce_public_js_except
+    elif tag == CompressConstants._include_css:
+
+        with open(include_path, 'r') as f:
+            data = f"/* {CompressConstants._include_css}{include_path} */\n" + f.read()
+
+        if minify:
+            with __profile_step(times, "cssmin"):
+                compressed_data = cssmin(data)
+        else:
+            compressed_data = data
+
+        # comp_css = cssmin(sys.stdin.read(), wrap=options.wrap)
+        compressed_data = compressed_data.replace("+", " + ").replace("  ", " ")
+        compressed_data = compressed_data.replace('opacity:0', 'opacity: 0')
 
+        return compressed_data
+
+    with open(include_path, 'r') as f:
+        return f.readlines()
 
 def __get_file_hash(abs_path: str) -> str:
+    """
+        Return the SHA-384 (base64) of a file, read by chunks (the vendor files may be large).
+    """
 
     with open(abs_path, 'rb') as f:
-        file_data = f.read()
+        sha_digest = hashlib.file_digest(f, "sha384").digest()
 
-    sha_digest = hashlib.sha384(file_data).digest()
     return b64encode(sha_digest).decode("utf-8")
 
+def __get_data_hash(data: bytes) -> str:
+    return b64encode(hashlib.sha384(data).digest()).decode("utf-8")
+
+def __write_file(path: str, data: bytes):
+    """
+        Write the file atomically: a reader never sees a partial file.
+    """
+
+    temp_path = path + f".{os.getpid()}.tmp"
+
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+
+    os.replace(temp_path, path)
+
 def __add_map_entry(system_path: str,
                     static_path: str,
                     file_hash: str,
                     compressed_file: str,
                     integrity_key_removal: str,
                     dictionary: {},
-                    verbose:bool):
+                    verbose:bool) -> str:
 
     integrity_key = compressed_file.replace(integrity_key_removal, "", 1).lower()
     for forbidden_char, replace_char in (("/", "_"), ("-","_"), (".", "_")):
@@ -338,6 +1118,8 @@ def __add_map_entry(system_path: str,
         'static': static_path,
     }
 
+    return integrity_key
+
 
 def __remove_comments(text):
     #
@@ -401,6 +1183,114 @@ def __remove_comments(text):
     return new_text
 
 
+def __get_write_path(comp_path: str, static_dir: str, generation_dir: str) -> str:
+    write_path = comp_path.rsplit(CompressConstants._file_extension, 1)[0] # Remove the extension
+    return os.path.join(os.path.join(static_dir, generation_dir), os.path.basename(write_path))
+
+def __compress_bundle(comp_path: str,
+                      write_path: str,
+                      static_dir: str,
+                      verbose: bool,
+                      minify: bool,
+                      reduce: bool,
+                      reduce_scopes: bool,
+                      inline: bool,
+                      header_js: str,
+                      header_css: str,
+                      include_cache: None | IncludeCache = None,
+                      times: None | dict = None,
+                      messages: None | list[str] = None) -> (str, str, tuple[int, int, int]):
+    """
+        Return the content of the bundle, its encode dictionary ("" if it is not reduced)
+        and the reduce indexes that it used. The reduced names are relocatable, they must
+        be shifted with `relocate_js` by the indexes of the previous bundles.
+
+        times:
+            Times of the steps (see `BuildProfile.get_step_times`), updated with the ones
+            of the bundle. None to not measure them.
+
+        messages:
+            List receiving the info messages, instead of printing them.
+    """
+
+    #
+    # Get the content of the file
+    #
+    file_data, reduce_public_js, reduce_public_js_except = __get_comp_data(comp_path,
+                                                                            static_dir,
+                                                                            verbose,
+                                                                            minify,
+                                                                            reduce,
+                                                                            inline,
+                                                                            include_cache,
+                                                                            times,
+                                                                            messages)
+
+    #
+    # Improve the indentation
+    #
+    file_data = file_data.replace("\t", "    ")  # this will normalize the spaces and place them into the end?
+    while "    " in file_data:
+        file_data = file_data.replace("    ", "\t")
+
+    #
+    # Reduce (encode) the data
+    #
+    encode_dictionary = ""
+    used_indexes = (0, 0, 0)
+
+    if reduce and write_path.endswith(".js"):
+        reduce_indexes = get_reduce_indexes()
+        set_reduce_indexes((0, 0, 0))
+
+        with __profile_step(times, "reduce"):
+            file_data, encode_dictionary = reduce_js(file_data,
+                                                     public=reduce_public_js,
+                                                     skip_items=reduce_public_js_except,
+                                                     verbose=verbose,
+                                                     relocatable=True,
+                                                     scopes=reduce_scopes)
+
+        used_indexes = get_reduce_indexes()
+        set_reduce_indexes(reduce_indexes)
+
+    #
+    # Add the header
+    #
+    if write_path.endswith(".css"):
+        file_data = header_css + file_data
+
+    elif write_path.endswith(".js"):
+        file_data = header_js + file_data
+
+    return file_data, encode_dictionary, used_indexes
+
+def __init_worker(include_cache: IncludeCache):
+    global __worker_include_cache
+    __worker_include_cache = include_cache
+
+def __compress_bundle_worker(*args) -> ((str, str, tuple[int, int, int]), float, float, dict, list[str]):
+    """
+        Executed by the workers, see `__compress_timed_bundle`. The include cache is kept
+        between the bundles of a worker.
+    """
+    return __compress_timed_bundle(*args, __worker_include_cache)
+
+def __compress_timed_bundle(*args) -> ((str, str, tuple[int, int, int]), float, float, dict, list[str]):
+    """
+        Return the data of `__compress_bundle`, its wall & CPU times, the times of its
+        steps (see `BuildProfile.get_step_times`) and its info messages.
+    """
+
+    times = BuildProfile.get_step_times()
+    messages = []
+    start_time = time.perf_counter()
+    start_cpu_time = time.process_time()
+
+    bundle_data = __compress_bundle(*args, times=times, messages=messages)
+
+    return bundle_data, time.perf_counter() - start_time, time.process_time() - start_cpu_time, times, messages
+
 def __compress_files(static_dir: str,
                      generation_dir: str,
                      map_dict: {},
@@ -409,252 +1299,897 @@ def __compress_files(static_dir: str,
                      verbose: bool,
                      minify: bool,
                      reduce: bool,
+                     reduce_scopes: bool,
                      versioning: None | str,
-                     exclude_paths: list[str],
+                     file_index: FileIndex,
                      header_js: str = "",
                      header_css: str = "",
-                     inline: bool = True) -> None:
+                     inline: bool = True,
+                     cache_dir: None | str = None,
+                     workers: None | int = 1,
+                     state: None | BuildState = None,
+                     profile: None | BuildProfile = None) -> dict[str, tuple[None | str, list[str]]]:
+    """
+        Compress and write the bundles (.comp files).
+
+        Return the map key and the written paths of each bundle, by .comp path.
+    """
 
     if verbose:
         print("\n[GENERATING JS & CSS FILES]\n")
 
 
+    comp_paths = file_index.comp_paths
+
     #
-    # Get the files and sort them
+    # Compress the bundles: they are loaded from the cache, or compressed (in
+    # parallel when there are many workers)
     #
-    comp_paths = []
-    for dir_path, _, filenames in os.walk(static_dir):
-        for filename in filenames:
+    cache = None if cache_dir is None else BuildCache(cache_dir)
+    include_cache = IncludeCache(None if cache_dir is None else os.path.join(cache_dir, "includes"))
+    bundles = {}
+    outputs = {}
+    dependencies = {}
 
-            abs_path = os.path.abspath(os.path.join(dir_path, filename))
+    if state is not None:
+        state.include_cache = include_cache
 
-            if any(include_string in abs_path for include_string in exclude_paths) or \
-               not abs_path.endswith(CompressConstants._file_extension):
-                continue
+    for comp_path in comp_paths:
 
-            comp_paths.append(abs_path)
+        if cache is not None or state is not None or profile is not None:
+            dependencies[comp_path] = __get_comp_dependencies(comp_path, static_dir)
+
+            if state is not None:
+                state.dependencies[comp_path] = dependencies[comp_path]
+
+        # the generation time of a bundle must not come from the cache
+        if cache is not None and not __has_generation_info(comp_path):
+            bundle_key = cache.get_key([comp_path] + dependencies[comp_path],
+                                       {"minify": minify,
+                                        "reduce": reduce,
+                                        "reduce_scopes": reduce_scopes,
+                                        "inline": inline,
+                                        "header_js": header_js,
+                                        "header_css": header_css})
+            bundles[comp_path] = (bundle_key, cache.get(bundle_key))
+        else:
+            bundles[comp_path] = (None, None)
+
+    compress_paths = [comp_path for comp_path, (_, bundle_data) in bundles.items() if bundle_data is None]
+
+    if workers == 1 or len(compress_paths) <= 1:
+        results = (__compress_timed_bundle(comp_path,
+                                            __get_write_path(comp_path, static_dir, generation_dir),
+                                            static_dir,
+                                            verbose,
+                                            minify,
+                                            reduce,
+                                            reduce_scopes,
+                                            inline,
+                                            header_js,
+                                            header_css,
+                                            include_cache) for comp_path in compress_paths)
+        executor = None
 
-    comp_paths.sort()
+    else:
+        # The workers print nothing, so the output is in order
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       initializer=__init_worker,
+                                       initargs=(include_cache,))
+        results = [executor.submit(__compress_bundle_worker,
+                                   comp_path,
+                                   __get_write_path(comp_path, static_dir, generation_dir),
+                                   static_dir,
+                                   False,
+                                   minify,
+                                   reduce,
+                                   reduce_scopes,
+                                   inline,
+                                   header_js,
+                                   header_css) for comp_path in compress_paths]
+        results = (future.result() for future in results)
 
     #
     # Process the comp paths
     #
-    for comp_path in comp_paths:
-
-        #
-        # Get the content of the file
-        #
-        file_data, reduce_public_js, reduce_public_js_except = __get_comp_data(comp_path,
-                                                                                static_dir,
-                                                                                verbose,
-                                                                                minify,
-                                                                                reduce,
-                                                                                inline)
-
-        #
-        # Improve the indentation
-        #
-        file_data = file_data.replace("\t", "    ")  # this will normalize the spaces and place them into the end?
-        while "    " in file_data:
-            file_data = file_data.replace("    ", "\t")
-
-
-        #
-        # Define the system file name (can be renamed later)
-        #
-        write_path = comp_path.rsplit(CompressConstants._file_extension, 1)[0] # Remove the extension
-        integrity_key_path = write_path
-        write_path = os.path.join(os.path.join(static_dir, generation_dir), os.path.basename(write_path))
-
-        #
-        # Reduce (encode) the data
-        #
-        encode_dictionary = ""
-        if reduce and write_path.endswith(".js"):
-            file_data, encode_dictionary = reduce_js(file_data,
-                                                     public=reduce_public_js,
-                                                     skip_items=reduce_public_js_except,
-                                                     verbose=verbose)
+    try:
+        for comp_path in comp_paths:
 
-        #
-        # Add the header
-        #
-        if write_path.endswith(".css"):
-            file_data = header_css + file_data
+            bundle_key, bundle_data = bundles[comp_path]
+            compress_time, compress_cpu_time = 0, 0
+            times = BuildProfile.get_step_times()
 
-        elif write_path.endswith(".js"):
-            file_data = header_js + file_data
+            if bundle_data is not None:
+                if verbose:
+                    print(f" {comp_path} (cached)")
 
-        #
-        # Write the file
-        #
-        with open(write_path, "w") as f:
-            f.write(file_data)
+            else:
+                if executor is not None and verbose:
+                    print(" " + comp_path)
+
+                bundle_data, compress_time, compress_cpu_time, times, messages = next(results)
+
+                for message in messages:
+                    print(message)
+
+                if bundle_key is not None:
+                    cache.set(bundle_key, *bundle_data)
+
+            if state is not None:
+                state.bundles[comp_path] = bundle_data
+                state.start_indexes[comp_path] = get_reduce_indexes()
+
+            write_start_time = time.perf_counter()
+            write_start_cpu_time = time.process_time()
+            outputs[comp_path] = __write_bundle(comp_path,
+                                                 bundle_data,
+                                                 static_dir,
+                                                 generation_dir,
+                                                 map_dict,
+                                                 git_short_hash,
+                                                 integrity_key_removal,
+                                                 verbose,
+                                                 reduce,
+                                                 versioning,
+                                                 times)
+
+            if state is not None:
+                state.outputs[comp_path] = outputs[comp_path]
+
+            if profile is not None:
+                profile.add_bundle(comp_path, {"cached": bundles[comp_path][1] is not None,
+                                               "compress_wall_time": compress_time,
+                                               "compress_cpu_time": compress_cpu_time,
+                                               "write_wall_time": time.perf_counter() - write_start_time,
+                                               "write_cpu_time": time.process_time() - write_start_cpu_time,
+                                               **times,
+                                               "bytes_in": __get_files_size([comp_path] + dependencies[comp_path]),
+                                               "bytes_out": __get_files_size(outputs[comp_path][1][:1])})
+
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
 
-        #
-        # Calculate the hash
-        #
-        file_hash = __get_file_hash(write_path)
+    #
+    # Remove the cache entries of the previous builds
+    #
+    if cache is not None:
+        removed = cache.prune({bundle_key for bundle_key, _ in bundles.values()})
+
+        if verbose and removed > 0:
+            print(f"\n Removed {removed} unused cache entries")
+
+    return outputs
+
+
+def __write_bundle(comp_path: str,
+                   bundle_data: (str, str, tuple[int, int, int]),
+                   static_dir: str,
+                   generation_dir: str,
+                   map_dict: {},
+                   git_short_hash: str,
+                   integrity_key_removal: str,
+                   verbose: bool,
+                   reduce: bool,
+                   versioning: None | str,
+                   times: None | dict = None) -> (None | str, list[str]):
+    """
+        Write a bundle returned by `__compress_bundle` after the previous ones (its
+        reduced names are shifted by the global indexes), and add it to the map.
 
-        #
-        # Rename the file
-        #
+        Return its map key (None without map) and the written paths.
+    """
 
-        if versioning in ("md5", "git"):
+    #
+    # Define the system file name (can be renamed later)
+    #
+    write_path = __get_write_path(comp_path, static_dir, generation_dir)
+    integrity_key_path = comp_path.rsplit(CompressConstants._file_extension, 1)[0] # Remove the extension
 
-            file_name = os.path.basename(write_path)
+    file_data, encode_dictionary, used_indexes = bundle_data
 
-            if ".min." not in file_name:
-                raise ValueError(
-                    'Error, invalid filename: It must end with ".js{0}" or ".css{0}" not filename = '.format(
-                        CompressConstants._file_extension) + file_name)
+    #
+    # Shift the reduced names after the ones of the previous bundles
+    #
+    if reduce and write_path.endswith(".js"):
+        reduce_indexes = get_reduce_indexes()
 
-            if versioning == "md5":
-                new_value = file_hash
-            else:
-                new_value = git_short_hash
+        with __profile_step(times, "relocate"):
+            file_data = relocate_js(file_data, reduce_indexes)
+            encode_dictionary = relocate_js(encode_dictionary, reduce_indexes, dictionary=True)
 
+        set_reduce_indexes(tuple(index + used for index, used in zip(reduce_indexes, used_indexes)))
 
-            new_value = new_value.replace("/", "-") # Any slash would break the system path
-            file_extension = file_name.rsplit(".min.", 1)[1]
-            new_file_name = f"{new_value}.min.{file_extension}"
-            new_write_path = os.path.join(os.path.dirname(write_path), new_file_name)
-            os.rename(write_path, new_write_path)
-            write_path = new_write_path
+    #
+    # Calculate the hash, from the data to write
+    #
+    file_bytes = file_data.encode("utf-8")
 
+    with __profile_step(times, "hash"):
+        file_hash = __get_data_hash(file_bytes)
 
-        #
-        # Write the encode dictionary
-        #
-        if reduce and write_path.endswith(".js"):
-            with open(write_path.replace("min.js", "min.dict"), "w") as f:
-                f.write(encode_dictionary)
+    #
+    # Define the versioned file name
+    #
+    if versioning in ("md5", "git"):
 
+        file_name = os.path.basename(write_path)
 
-        #
-        # Add to the integrity dict
-        #
-        if map_dict is not None:
-            static_path = f"/{os.path.basename(generation_dir)}{write_path.replace(generation_dir, "")}"
-            __add_map_entry(system_path=write_path,
-                           static_path=static_path,
-                           file_hash=file_hash,
-                           compressed_file=integrity_key_path,
-                           integrity_key_removal=integrity_key_removal,
-                           dictionary=map_dict,
-                           verbose=verbose)
+        if ".min." not in file_name:
+            raise ValueError(
+                'Error, invalid filename: It must end with ".js{0}" or ".css{0}" not filename = '.format(
+                    CompressConstants._file_extension) + file_name)
 
+        if versioning == "md5":
+            new_value = file_hash
+        else:
+            new_value = git_short_hash
 
-def __add_already_minified_files(static_dir: str,
-                                 integrity_key_removal: str,
-                                 verbose: bool,
-                                 exclude_paths: list[str],
-                                 map_dict: {}) -> dict:
 
-    if verbose:
-        print("\n[ADDING ALREADY MINIFIED FILES]\n")
+        new_value = new_value.replace("/", "-") # Any slash would break the system path
+        file_extension = file_name.rsplit(".min.", 1)[1]
+        new_file_name = f"{new_value}.min.{file_extension}"
+        write_path = os.path.join(os.path.dirname(write_path), new_file_name)
 
     #
-    # Get the file paths and sort them
+    # Write the file, and the encode dictionary
     #
-    file_paths = []
-    for dir_path, _, filenames in os.walk(static_dir):
-        for filename in filenames:
-            file_path = os.path.abspath(os.path.join(dir_path, filename))
-
-            if any(include_string in file_path for include_string in exclude_paths):
-                continue
+    __write_file(write_path, file_bytes)
+    written_paths = [write_path]
 
-            if file_path.endswith(".min.js") or file_path.endswith(".min.css"):
-                file_paths.append(file_path)
+    if reduce and write_path.endswith(".js"):
+        written_paths.append(write_path.replace("min.js", "min.dict"))
+        __write_file(written_paths[-1], encode_dictionary.encode("utf-8"))
 
-    file_paths.sort()
 
     #
-    # Process the files
+    # Add to the integrity dict
     #
-    for file_path in file_paths:
+    integrity_key = None
 
-        if verbose:
-            print(" " + file_path)
+    if map_dict is not None:
+        static_path = f"/{os.path.basename(generation_dir)}{write_path.replace(generation_dir, "")}"
+        integrity_key = __add_map_entry(system_path=write_path,
+                                        static_path=static_path,
+                                        file_hash=file_hash,
+                                        compressed_file=integrity_key_path,
+                                        integrity_key_removal=integrity_key_removal,
+                                        dictionary=map_dict,
+                                        verbose=verbose)
+
+    return integrity_key, written_paths
+
+def __add_already_minified_files(integrity_key_removal: str,
+                                 verbose: bool,
+                                 file_index: FileIndex,
+                                 map_dict: {},
+                                 integrity_cache: None | IntegrityCache = None,
+                                 verify_integrity: bool = False,
+                                 state: None | BuildState = None) -> dict:
+
+    if verbose:
+        print("\n[ADDING ALREADY MINIFIED FILES]\n")
 
-        file_hash = __get_file_hash(file_path)
-        static_path = "/static/" + file_path.split("static/")[1]
+    for file_path in file_index.minified_paths:
 
-        __add_map_entry(system_path=file_path,
-                       static_path=static_path,
-                       file_hash=file_hash,
-                       compressed_file=file_path,
-                       integrity_key_removal=integrity_key_removal,
-                       dictionary=map_dict,
-                       verbose=verbose)
+        integrity_key = __add_minified_file(file_path,
+                                            integrity_key_removal,
+                                            verbose,
+                                            map_dict,
+                                            integrity_cache,
+                                            verify_integrity)
+
+        if state is not None:
+            state.minified[file_path] = integrity_key
+
+    if integrity_cache is not None:
+        integrity_cache.save()
+
+        if state is not None:
+            state.integrity_cache = integrity_cache
 
     return map_dict # this may not be necessary, but it will clarify the output.
 
+def __add_minified_file(file_path: str,
+                        integrity_key_removal: str,
+                        verbose: bool,
+                        map_dict: {},
+                        integrity_cache: None | IntegrityCache = None,
+                        verify_integrity: bool = False) -> str:
+
+    if verbose:
+        print(" " + file_path)
+
+    file_hash = __get_minified_file_hash(file_path, integrity_cache, verify_integrity)
+    static_path = "/static/" + file_path.split("static/")[1]
+
+    return __add_map_entry(system_path=file_path,
+                           static_path=static_path,
+                           file_hash=file_hash,
+                           compressed_file=file_path,
+                           integrity_key_removal=integrity_key_removal,
+                           dictionary=map_dict,
+                           verbose=verbose)
+
+def __get_minified_file_hash(file_path: str, integrity_cache: None | IntegrityCache, verify_integrity: bool) -> str:
+    """
+        Return the hash of an already minified file, from the integrity cache if the
+        file did not change.
+    """
+
+    if integrity_cache is None:
+        return __get_file_hash(file_path)
+
+    file_stat = os.stat(file_path)
+    cached_hash = integrity_cache.get(file_path, file_stat)
+
+    if cached_hash is not None and not verify_integrity:
+        return cached_hash
+
+    file_hash = __get_file_hash(file_path)
+
+    if cached_hash is not None and cached_hash != file_hash:
+        print(f"[Warning] {file_path} changed without changing its size, modification time and inode")
+
+    integrity_cache.set(file_path, file_stat, file_hash)
+
+    return file_hash
+
 def __update_static_files(templates_dir: str,
                           generation_dir: str,
                           git_short_hash: str | None,
-                          exclude_paths: list[str],
                           verbose: bool,
                           map_dict: dict,
-                          keep_tree: bool = False) -> None:
+                          file_index: FileIndex,
+                          keep_tree: bool = False,
+                          state: None | BuildState = None) -> list[str]:
+    """
+        Write the templates (.comp.html) with the values of the map, and return the
+        written paths. The placeholders that could not be replaced are printed.
+    """
 
     if verbose:
         print("\n[GENERATING STATIC FILES]\n")
 
-    for dir_path, _, filenames in os.walk(templates_dir):
-        for filename in filenames:
+    placeholders = __get_placeholders(map_dict, git_short_hash)
+    unresolved_placeholders = {}
+    written_paths = []
 
-            template_path = os.path.abspath(os.path.join(dir_path, filename))
+    for template_path in file_index.template_paths:
 
-            if any(include_string in template_path for include_string in exclude_paths):
-                continue
+        write_path, used, unresolved = __write_static_file(template_path,
+                                                           templates_dir,
+                                                           generation_dir,
+                                                           keep_tree,
+                                                           placeholders,
+                                                           verbose)
+        written_paths.append(write_path)
+
+        if len(unresolved) > 0:
+            unresolved_placeholders[template_path] = unresolved
+
+        if state is not None:
+            state.templates[template_path] = (write_path, used)
+
+    __print_unresolved_placeholders(unresolved_placeholders)
+
+    return written_paths
+
+def __get_placeholders(map_dict: dict, git_short_hash: str | None) -> dict[str, str]:
+    """
+        Return the values of the placeholders: {{key.integrity}}, {{key.static}} & {{git_versioning}}
+    """
+
+    placeholders = {}
+
+    for key, values in map_dict.items():
+        placeholders[key + ".integrity"] = values['integrity']
+        placeholders[key + ".static"] = values['static']
+
+    if git_short_hash is not None:
+        placeholders[CompressConstants._git_versioning] = git_short_hash
+
+    return placeholders
+
+def __print_unresolved_placeholders(unresolved_placeholders: dict[str, list[str]]):
+    for template_path, unresolved in sorted(unresolved_placeholders.items()):
+        print(f"[Warning] unresolved placeholders in {template_path}: " +
+              ", ".join("{{" + placeholder + "}}" for placeholder in unresolved))
+
+def __get_static_file_path(template_path: str, templates_dir: str, generation_dir: str, keep_tree: bool) -> str:
+
+    final_name = os.path.basename(template_path).replace(".comp.",".")
+
+    if keep_tree:
+
+        if not templates_dir.endswith("/"):
+            templates_dir += "/"
+
+        base_name = os.path.basename(os.path.dirname(templates_dir))
+        rel_path = template_path.split(templates_dir)[1]
+        write_dir =  os.path.dirname(os.path.join(generation_dir, base_name, rel_path))
+
+        if not os.path.exists(write_dir):
+            os.makedirs(write_dir)
+
+        return os.path.join(write_dir, final_name)
+
+    return os.path.join(generation_dir, final_name)
+
+def __write_static_file(template_path: str,
+                        templates_dir: str,
+                        generation_dir: str,
+                        keep_tree: bool,
+                        placeholders: dict[str, str],
+                        verbose: bool,
+                        overwrite: bool = False) -> (str, set[str], list[str]):
+    """
+        Write a template with the values of the placeholders.
+
+        Return the written path, the placeholders used by the template and the
+        unresolved ones.
+    """
+
+    with open(template_path, "r") as f:
+        template = f.read()
+
+    template = template.replace("<!DOCTYPE html>",
+                                "<!DOCTYPE html>\n\n<!-- File dynamically generated -->\n")
+
+    used = {match.group(1) for match in CompressConstants._re_placeholder.finditer(template)}
+    template, unresolved = __substitute_placeholders(template, placeholders)
+
+    write_path = __get_static_file_path(template_path, templates_dir, generation_dir, keep_tree)
 
-            if not template_path.endswith(CompressConstants._file_extension+".html"):
+    if not overwrite and os.path.exists(write_path):
+        raise ValueError("File already exists: " + write_path)
+
+    with open(write_path, "w") as f:
+        f.write(template)
+
+    if verbose:
+        print(" " + write_path)
+
+    return write_path, used, unresolved
+
+def __substitute_placeholders(template: str, placeholders: dict[str, str]) -> (str, list[str]):
+    """
+        Replace all the placeholders of the template in a single scan.
+
+        Return the new template, and the placeholders without value (they are kept).
+    """
+
+    unresolved = []
+
+    def get_value(match):
+        try:
+            return placeholders[match.group(1)]
+        except KeyError:
+            if match.group(1) not in unresolved:
+                unresolved.append(match.group(1))
+            return match.group(0)
+
+    return CompressConstants._re_placeholder.sub(get_value, template), unresolved
+
+def __precompress_files(paths: list[str], encodings: list[str], map_dict: dict, verbose: bool) -> dict[str, list[str]]:
+    """
+        Write the compressed copies of the files in parallel (zlib & brotli release the
+        GIL), and add their sizes to the map entries of the files.
+
+        Return the written paths, by file path.
+    """
+
+    if verbose:
+        print("\n[PRECOMPRESSING FILES]\n")
+
+    with ThreadPoolExecutor() as executor:
+        sizes = dict(zip(paths, executor.map(__precompress_file, paths, [encodings] * len(paths))))
+
+    for values in map_dict.values():
+        if values['abs_path'] in sizes:
+            values.update(sizes[values['abs_path']])
+
+    sidecar_paths = {}
+
+    for path in paths:
+        sidecar_paths[path] = [path + CompressConstants._precompress_extensions[encoding] for encoding in encodings]
+
+        if verbose:
+            print(f" {path}\t" + "\t".join(f"{key}={value}" for key, value in sizes[path].items()))
+
+    return sidecar_paths
+
+def __precompress_file(path: str, encodings: list[str]) -> dict[str, int]:
+    """
+        Write the compressed copies of a file (ex: app.min.js.gz), and return the size
+        of the file and of its copies.
+    """
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    sizes = {"size": len(data)}
+
+    for encoding in encodings:
+        if encoding == "gz":
+            # mtime=0: the same content always gives the same file
+            compressed_data = gzip.compress(data, compresslevel=9, mtime=0)
+        else:
+            compressed_data = brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)
+
+        with open(path + CompressConstants._precompress_extensions[encoding], 'wb') as f:
+            f.write(compressed_data)
+
+        sizes[f"{encoding}_size"] = len(compressed_data)
+
+    return sizes
+
+def __watch(state: BuildState):
+    """
+        Rebuild what is affected by the changes, until Ctrl+C.
+    """
+
+    if INotify is None:
+        print("\n[WATCHING CHANGES] (scanning every {}s, install inotify_simple for instant updates)\n".format(
+            CompressConstants._watch_poll_interval))
+        changes = __poll_changes(state)
+    else:
+        print("\n[WATCHING CHANGES] (inotify)\n")
+        changes = __inotify_changes(state)
+
+    try:
+        for changed_paths in changes:
+            __rebuild_changes(state, changed_paths)
+
+    except KeyboardInterrupt:
+        pass
+
+def __rebuild_changes(state: BuildState, changed_paths: set[str]):
+    """
+        Rebuild what is affected by the changes, and by the ones of the previous failed
+        rebuild: a failure (ex: a missing include while the files are edited) can leave
+        the state half-updated, so its changed paths are processed again with the next
+        change.
+    """
+
+    changed_paths = changed_paths | state.failed_paths
+    start_time = time.perf_counter()
+
+    try:
+        __rebuild(state, changed_paths)
+
+    except (Exception, SystemExit) as error:
+        # SystemExit: reduce_js exits on the errors of the JS
+        state.failed_paths = changed_paths
+        print(f"[Error] rebuild failed: {error!r}")
+        return
+
+    state.failed_paths = set()
+
+    print(f"[Rebuilt] {len(changed_paths)} changed file(s) in "
+          f"{(time.perf_counter() - start_time) * 1000:.1f} ms\n")
+
+def __is_watched(state: BuildState, path: str) -> bool:
+    """
+        Return True if the file is an input of the build.
+    """
+
+    options = state.options
+
+    if path.startswith(os.path.join(os.path.abspath(options["generation_dir"]), "")):
+        return False
+
+    if path in state.minified or path in state.dependencies or \
+       any(path in dependencies for dependencies in state.dependencies.values()):
+        return True
+
+    if state.file_index.is_excluded(path):
+        return False
+
+    if path.startswith(os.path.join(os.path.abspath(options["templates_dir"]), "")) and \
+       path.endswith(CompressConstants._file_extension + ".html"):
+        return True
+
+    return path.startswith(os.path.join(os.path.abspath(options["static_dir"]), "")) and \
+           path.endswith((CompressConstants._file_extension,) + CompressConstants._minified_extensions)
+
+def __get_watched_files(state: BuildState) -> dict[str, tuple[int, int]]:
+    """
+        Return the (mtime_ns, size) of the inputs of the build.
+    """
+
+    files = {}
+
+    paths = set(state.minified)
+    for comp_path, dependencies in state.dependencies.items():
+        paths.add(comp_path)
+        paths.update(dependencies)
+
+    file_index = FileIndex(state.options["static_dir"], state.options["templates_dir"], state.options["exclude_paths"])
+
+    for path in file_index.comp_paths + file_index.minified_paths + file_index.template_paths:
+        if __is_watched(state, path):
+            paths.add(path)
+
+    for path in paths:
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            continue
+
+        files[path] = (file_stat.st_mtime_ns, file_stat.st_size)
+
+    return files
+
+def __poll_changes(state: BuildState):
+    """
+        Yield the paths changed (modified, created or deleted) between two scans.
+    """
+
+    files = __get_watched_files(state)
+
+    while True:
+        time.sleep(CompressConstants._watch_poll_interval)
+
+        new_files = __get_watched_files(state)
+        changed_paths = {path for path in files.keys() | new_files.keys() if files.get(path) != new_files.get(path)}
+        files = new_files
+
+        if len(changed_paths) > 0:
+            yield changed_paths
+
+def __inotify_changes(state: BuildState):
+    """
+        Yield the paths changed (modified, created or deleted), from the inotify events
+        of the static & templates directories, and of the directories of the includes.
+    """
+
+    inotify = INotify()
+    watch_flags = inotify_flags.CLOSE_WRITE | inotify_flags.CREATE | inotify_flags.DELETE | \
+                  inotify_flags.MOVED_TO | inotify_flags.MOVED_FROM
+    directories = {}
+
+    def add_directory(directory: str, recursive: bool):
+        for dir_path, _, _ in os.walk(directory):
+            if not __is_watched_directory(state, dir_path):
                 continue
 
-            with open(template_path, "r") as f:
-                template = f.read()
+            directories[inotify.add_watch(dir_path, watch_flags)] = os.path.abspath(dir_path)
 
-            if git_short_hash is not None:
-                template = template.replace("{{git_versioning}}", git_short_hash)
+            if not recursive:
+                break
 
-            template = template.replace("<!DOCTYPE html>",
-                                        "<!DOCTYPE html>\n\n<!-- File dynamically generated -->\n")
+    def add_include_directories():
+        for dependencies in state.dependencies.values():
+            for dependency in dependencies:
+                if os.path.dirname(dependency) not in directories.values():
+                    add_directory(os.path.dirname(dependency), False)
 
-            for key, values in map_dict.items():
+    add_directory(state.options["static_dir"], True)
+    add_directory(state.options["templates_dir"], True)
+    add_include_directories()
 
-                integrity = values['integrity']
-                static = values['static']
+    while True:
+        events = inotify.read()
+        time.sleep(CompressConstants._watch_delay)
+        events += inotify.read(timeout=0)
 
-                template = template.replace("{{" + key + ".integrity}}", integrity)
-                template = template.replace("{{" + key + ".static}}", static)
+        changed_paths = set()
 
+        for event in events:
+            if event.wd not in directories:
+                continue
+
+            path = os.path.join(directories[event.wd], event.name)
 
-            final_name = os.path.basename(template_path).replace(".comp.",".")
+            if event.mask & inotify_flags.ISDIR:
+                if event.mask & (inotify_flags.CREATE | inotify_flags.MOVED_TO):
+                    add_directory(path, True)
 
-            if keep_tree:
+                    # the files created before the watch was added
+                    for dir_path, _, filenames in os.walk(path):
+                        for filename in filenames:
+                            file_path = os.path.abspath(os.path.join(dir_path, filename))
+                            if __is_watched(state, file_path):
+                                changed_paths.add(file_path)
 
-                if not templates_dir.endswith("/"):
-                    templates_dir += "/"
+            elif __is_watched(state, path):
+                changed_paths.add(path)
 
-                base_name = os.path.basename(os.path.dirname(templates_dir))
-                rel_path = template_path.split(templates_dir)[1]
-                write_dir =  os.path.dirname(os.path.join(generation_dir, base_name, rel_path))
+        if len(changed_paths) > 0:
+            yield changed_paths
+            add_include_directories()
 
-                if not os.path.exists(write_dir):
-                    os.makedirs(write_dir)
+def __is_watched_directory(state: BuildState, directory: str) -> bool:
+    directory = os.path.join(os.path.abspath(directory), "")
+    return not directory.startswith(os.path.join(os.path.abspath(state.options["generation_dir"]), ""))
 
-                write_path = os.path.join(write_dir, final_name)
+def __rebuild(state: BuildState, changed_paths: set[str]):
+    """
+        Generate again the bundles, map entries and templates affected by the changed
+        files (see `BuildState`).
+    """
 
+    options = state.options
+    map_dict = state.map_dict
+
+    #
+    # Already minified files
+    #
+    for path in sorted(changed_paths):
+        if path.endswith(CompressConstants._minified_extensions) and \
+           path.startswith(os.path.join(os.path.abspath(options["static_dir"]), "")) and \
+           not state.file_index.is_excluded(path):
+
+            if os.path.exists(path):
+                state.minified[path] = __add_minified_file(path,
+                                                           options["integrity_key_removal"],
+                                                           options["verbose"],
+                                                           map_dict,
+                                                           state.integrity_cache,
+                                                           options["verify_integrity"])
+            elif path in state.minified:
+                map_dict.pop(state.minified.pop(path), None)
+
+                if state.integrity_cache is not None:
+                    state.integrity_cache.remove(path)
+
+    if state.integrity_cache is not None and \
+       any(path in state.minified or path.endswith(CompressConstants._minified_extensions) for path in changed_paths):
+        state.integrity_cache.save()
+
+    #
+    # Compress the affected bundles (new, modified, or with a modified include)
+    #
+    comp_paths = set(state.dependencies)
+
+    for path in changed_paths:
+        if path.endswith(CompressConstants._file_extension) and __is_watched(state, path):
+            if os.path.exists(path):
+                comp_paths.add(path)
             else:
-                write_path = os.path.join(generation_dir, final_name)
+                comp_paths.discard(path)
+
+    affected_paths = sorted(comp_path for comp_path in comp_paths
+                            if comp_path in changed_paths or
+                               not changed_paths.isdisjoint(state.dependencies.get(comp_path, ())))
+
+    new_bundles = {}
+
+    for comp_path in affected_paths:
+        # the missing includes are watched too, so creating them rebuilds the bundle
+        state.dependencies[comp_path] = __get_comp_dependencies(comp_path, options["static_dir"], test_paths=False)
+
+    for comp_path in affected_paths:
+        new_bundles[comp_path] = __compress_bundle(comp_path,
+                                                   __get_write_path(comp_path,
+                                                                    options["static_dir"],
+                                                                    options["generation_dir"]),
+                                                   options["static_dir"],
+                                                   options["verbose"],
+                                                   options["minify"],
+                                                   options["reduce"],
+                                                   options["reduce_scopes"],
+                                                   options["inline"],
+                                                   options["header_js"],
+                                                   options["header_css"],
+                                                   state.include_cache)
+
+    #
+    # Remove the deleted bundles
+    #
+    for comp_path in set(state.dependencies) - comp_paths:
+        del state.dependencies[comp_path]
+        state.bundles.pop(comp_path, None) # not compressed if its first build failed
+        state.start_indexes.pop(comp_path, None)
+        __remove_bundle_output(state, comp_path)
+
+    state.bundles.update(new_bundles)
+
+    #
+    # Write the bundles. The ones before the first change, or whose reduced names
+    # are not shifted, keep their files.
+    #
+    set_reduce_indexes(state.reduce_indexes)
+    written_bundles = []
+
+    for comp_path in sorted(state.bundles):
+
+        reduce_indexes = get_reduce_indexes()
+
+        if comp_path not in new_bundles and state.start_indexes[comp_path] == reduce_indexes:
+            used_indexes = state.bundles[comp_path][2]
+            set_reduce_indexes(tuple(index + used for index, used in zip(reduce_indexes, used_indexes)))
+            continue
+
+        __remove_bundle_output(state, comp_path)
+
+        state.start_indexes[comp_path] = reduce_indexes
+        state.outputs[comp_path] = __write_bundle(comp_path,
+                                                  state.bundles[comp_path],
+                                                  options["static_dir"],
+                                                  options["generation_dir"],
+                                                  map_dict,
+                                                  options["git_short_hash"],
+                                                  options["integrity_key_removal"],
+                                                  options["verbose"],
+                                                  options["reduce"],
+                                                  options["versioning"])
+        written_bundles.append(comp_path)
+
+    if len(options["precompress"]) > 0 and len(written_bundles) > 0:
+        sidecar_paths = __precompress_files([state.outputs[comp_path][1][0] for comp_path in written_bundles],
+                                            options["precompress"],
+                                            map_dict,
+                                            options["verbose"])
+
+        for comp_path in written_bundles:
+            written_paths = state.outputs[comp_path][1]
+            written_paths += sidecar_paths[written_paths[0]]
+
+    #
+    # Write the templates that changed, or that use a changed map entry
+    #
+    previous_map = state.written_map
+    changed_keys = {key for key in previous_map.keys() | map_dict.keys() if previous_map.get(key) != map_dict.get(key)}
+    changed_placeholders = {key + suffix for key in changed_keys for suffix in (".integrity", ".static")}
+
+    template_paths = set(state.templates)
+
+    for path in changed_paths:
+        if path.endswith(CompressConstants._file_extension + ".html") and __is_watched(state, path):
+            if os.path.exists(path):
+                template_paths.add(path)
+
+            elif path in state.templates:
+                template_paths.discard(path)
+                write_path = state.templates.pop(path)[0]
+
+                for remove_path in [write_path] + [write_path + extension for extension in
+                                                   CompressConstants._precompress_extensions.values()]:
+                    if os.path.exists(remove_path):
+                        os.remove(remove_path)
+
+    placeholders = __get_placeholders(map_dict, options["git_short_hash"])
+    unresolved_placeholders = {}
+    written_paths = []
+
+    for template_path in sorted(template_paths):
+
+        if template_path not in changed_paths and \
+           changed_placeholders.isdisjoint(state.templates[template_path][1]):
+            continue
+
+        write_path, used, unresolved = __write_static_file(template_path,
+                                                           options["templates_dir"],
+                                                           options["generation_dir"],
+                                                           options["keep_tree"],
+                                                           placeholders,
+                                                           options["verbose"],
+                                                           overwrite=True)
+        state.templates[template_path] = (write_path, used)
+        written_paths.append(write_path)
+
+        if len(unresolved) > 0:
+            unresolved_placeholders[template_path] = unresolved
+
+    __print_unresolved_placeholders(unresolved_placeholders)
+
+    if len(options["precompress"]) > 0 and len(written_paths) > 0:
+        __precompress_files(written_paths, options["precompress"], map_dict, options["verbose"])
+
+    if len(changed_keys) > 0 and options["map_file_name"] is not None:
+        __write_map_file(options["generation_dir"], options["map_file_name"], map_dict)
+
+    state.written_map = {key: dict(values) for key, values in map_dict.items()}
+
+def __remove_bundle_output(state: BuildState, comp_path: str):
 
-            if os.path.exists(write_path):
-                raise ValueError("File already exists: " + write_path)
+    integrity_key, written_paths = state.outputs.pop(comp_path, (None, []))
 
-            with open(write_path, "w") as f:
-                f.write(template)
+    if integrity_key is not None:
+        state.map_dict.pop(integrity_key, None)
 
-            if verbose:
-                print(" " + write_path)
\ No newline at end of file
+    for written_path in written_paths:
+        if os.path.exists(written_path):
+            os.remove(written_path)
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+
+#
+#   This file is part of static_generator.
+#
+# Copyright (c) 2022-2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import static_generator.main as main
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class TestBuildCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.static_dir = os.path.join(self.directory.name, "static")
+        self.templates_dir = os.path.join(self.directory.name, "templates")
+        self.generation_dir = os.path.join(self.static_dir, "gen")
+        self.cache_dir = os.path.join(self.directory.name, "cache")
+
+        for directory in (self.static_dir, self.templates_dir, self.generation_dir):
+            os.makedirs(directory)
+
+        self.include_path = os.path.join(self.static_dir, "first.js")
+        write(self.include_path, "function first(){ return 1; }\n")
+        write(os.path.join(self.static_dir, "app.min.js.comp"), "includeJS:STATIC_PATH/first.js\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def build(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.run(self.static_dir, self.templates_dir, self.generation_dir, "map.json",
+                     self.static_dir + "/", ["/gen/"], verbose=False, cache_dir=self.cache_dir)
+
+    def list_entries(self, directory):
+        return sorted(file_name for file_name in os.listdir(directory) if main.CompressConstants._re_cache_key.fullmatch(
+                      file_name.removesuffix(main.CompressConstants._cache_extension)))
+
+    def test_unused_entries_are_removed(self):
+        self.build()
+        bundle_entries = self.list_entries(self.cache_dir)
+        include_entries = self.list_entries(os.path.join(self.cache_dir, "includes"))
+
+        write(self.include_path, "function first(){ return 2; }\n")
+        os.utime(self.include_path, ns=(0, 0))
+        self.build()
+
+        self.assertEqual(len(self.list_entries(self.cache_dir)), len(bundle_entries))
+        self.assertNotEqual(self.list_entries(self.cache_dir), bundle_entries)
+        self.assertEqual(self.list_entries(os.path.join(self.cache_dir, "includes")), include_entries)
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, main.CompressConstants._integrity_cache_name)))
+
+    def test_generation_info_is_not_cached(self):
+        write(os.path.join(self.static_dir, "info.min.js.comp"),
+              "/* @GENERATION_INFO */\nincludeJS:STATIC_PATH/first.js\n")
+        self.build()
+
+        self.assertEqual(len(self.list_entries(self.cache_dir)), 1)
@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+
+#
+#   This file is part of JSEncoder.
+#
+# Copyright (c) 2022-2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+import itertools
+import unittest
+
+from static_generator.JSEncoder.Names import NameAllocator, iter_index_names, iter_short_names, rank_encodes
+
+
+class TestNameAllocator(unittest.TestCase):
+
+    def test_most_used_first(self):
+        allocator = NameAllocator(iter_short_names())
+        allocator.add("rare")
+        allocator.add("common", 3)
+        allocator.add("other", 2)
+        self.assertEqual(allocator.allocate(), {"common": "a", "other": "b", "rare": "c"})
+
+    def test_equal_counts_keep_order(self):
+        allocator = NameAllocator(iter_short_names())
+        for symbol in ("first", "second", "third"):
+            allocator.add(symbol)
+        self.assertEqual(allocator.allocate(), {"first": "a", "second": "b", "third": "c"})
+
+    def test_list_of_names(self):
+        allocator = NameAllocator(["x", "y", "z"])
+        allocator.add("one", 2)
+        allocator.add("two")
+        self.assertEqual(allocator.allocate(), {"one": "x", "two": "y"})
+
+    def test_taken_and_reserved_names(self):
+        allocator = NameAllocator(["a", "do", "b", "c"], taken={"a"})
+        allocator.add("one")
+        allocator.add("two")
+        self.assertEqual(allocator.allocate(), {"one": "b", "two": "c"})
+
+
+class TestNames(unittest.TestCase):
+
+    def test_short_names(self):
+        names = iter_short_names()
+        self.assertEqual([next(names) for _ in range(3)], ["a", "b", "c"])
+        self.assertEqual(list(itertools.islice(iter_short_names(), 50, 54)), ["Y", "Z", "aa", "ab"])
+
+    def test_index_names(self):
+        names = iter_index_names("f", 1)
+        self.assertEqual([next(names) for _ in range(3)], ["f1", "f2", "f3"])
+
+    def test_rank_encodes(self):
+        items = {"rare": "v1", "common": "v2"}
+        rank_encodes(items, {"rare": [0], "common": [1, 2, 3]}, "v", 1)
+        self.assertEqual(items, {"rare": "v2", "common": "v1"})
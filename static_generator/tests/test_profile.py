@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+
+#
+#   This file is part of static_generator.
+#
+# Copyright (c) 2022-2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import static_generator.main as main
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class TestBuildProfile(unittest.TestCase):
+
+    def test_bundle_steps(self):
+        with tempfile.TemporaryDirectory() as directory:
+            static_dir = os.path.join(directory, "static")
+            templates_dir = os.path.join(directory, "templates")
+            generation_dir = os.path.join(static_dir, "gen")
+            profile_path = os.path.join(directory, "profile.json")
+
+            for path in (static_dir, templates_dir, generation_dir):
+                os.makedirs(path)
+
+            write(os.path.join(static_dir, "first.js"), "function first(){ var value = 1; return value; }\n")
+            write(os.path.join(static_dir, "first.css"), "body { color: red; }\n")
+            write(os.path.join(static_dir, "app.min.js.comp"), "includeJS:STATIC_PATH/first.js\n")
+            write(os.path.join(static_dir, "style.min.css.comp"), "includeCSS:STATIC_PATH/first.css\n")
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                main.run(static_dir, templates_dir, generation_dir, "map.json", static_dir + "/", ["/gen/"],
+                         verbose=False, profile_path=profile_path)
+
+            with open(profile_path, "r") as f:
+                bundles = json.load(f)["bundles"]
+
+        js_measures = bundles[os.path.join(static_dir, "app.min.js.comp")]
+        css_measures = bundles[os.path.join(static_dir, "style.min.css.comp")]
+
+        for step in main.BuildProfile._steps:
+            for measure in ("wall_time", "cpu_time"):
+                self.assertIn(f"{step}_{measure}", js_measures)
+
+        for step in ("jsmin", "reduce", "relocate", "hash"):
+            self.assertGreater(js_measures[step + "_wall_time"], 0)
+
+        self.assertEqual(js_measures["cssmin_wall_time"], 0)
+        self.assertGreater(css_measures["cssmin_wall_time"], 0)
+        self.assertEqual(css_measures["reduce_wall_time"], 0)
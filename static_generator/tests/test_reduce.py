@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+
+#
+#   This file is part of JSEncoder.
+#
+# Copyright (c) 2022-2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+import contextlib
+import io
+import unittest
+
+from static_generator.JSEncoder.main import reduce_js, set_reduce_indexes
+
+
+def reduce(text):
+    set_reduce_indexes((0, 0, 0))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        reduced_text, _ = reduce_js(text)
+
+    return reduced_text
+
+
+class TestFunctionLocals(unittest.TestCase):
+
+    def test_most_used_get_shortest_names(self):
+        self.assertEqual(reduce("function run(first, second){ var total = second + second; return total + first; }"),
+                         "function run(b, a){ var c = a + a; return c + b; }")
+
+    def test_file_names_are_not_given(self):
+        self.assertEqual(reduce("var a = 1; function run(first){ var total = first + a; return `${b}` + total; }"),
+                         "var a = 1; function run(c){ var d = c + a; return `${b}` + d; }")
+
+    def test_shorthand_keys(self):
+        self.assertEqual(reduce("function run(value){ return {value}; }"),
+                         "function run(a){ return {value:a}; }")
+
+    def test_template_expressions(self):
+        # the names inside ${...} are renamed, not the text of the template
+        self.assertEqual(reduce("function run(value, other){ return `${value}:${ other + value }` + `value`; }"),
+                         "function run(a, b){ return `${a}:${ b + a }` + `value`; }")
+
+    def test_nested_templates(self):
+        self.assertEqual(reduce("function run(value){ return `a${`b${value}`}`; }"),
+                         "function run(a){ return `a${`b${a}`}`; }")
+
+    def test_quotes_inside_templates(self):
+        # a quote of the template text does not start a string hiding the next names
+        self.assertEqual(reduce('function link(address, label){ return `<a href="${address}">${label}</a>`; }'),
+                         'function link(b, c){ return `<a href="${b}">${c}</a>`; }')
+        self.assertEqual(reduce("function quote(name){ return `${name}'s \"${name}\"`; }"),
+                         "function quote(a){ return `${a}'s \"${a}\"`; }")
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+
+#
+#   This file is part of JSEncoder.
+#
+# Copyright (c) 2022-2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+import unittest
+
+from static_generator.JSEncoder.Scopes import reduce_scopes
+from static_generator.JSEncoder.Tokenizer import tokenize_js
+
+
+def reduce(text):
+    words, _ = reduce_scopes([token.value for token in tokenize_js(text)])
+    return "".join(words)
+
+
+class TestHoistedBindings(unittest.TestCase):
+    """
+        A "var" or a function declared in a block must not get the name of a "let"
+        or a "const" of the same block.
+    """
+
+    def test_if_block(self):
+        self.assertEqual(reduce("function f(a){ if(a){ let local=a+1; var later=local*2; } return later; }"),
+                         "function f(a){ if(a){ let c=a+1; var b=c*2; } return b; }")
+
+    def test_for_of_block(self):
+        self.assertEqual(reduce("function f(a){ for(const item of a){ let local=item+1; var later=local*2; } "
+                                "return later; }"),
+                         "function f(a){ for(const c of a){ let d=c+1; var b=d*2; } return b; }")
+
+    def test_try_block(self):
+        self.assertEqual(reduce("function f(a){ try{ let local=a+1; var later=local*2; "
+                                "function inner(){ return local; } } catch(error){ var failed=error; } "
+                                "return [later, failed, inner]; }"),
+                         "function f(a){ try{ let d=a+1; var b=d*2; function c(){ return d; } } "
+                         "catch(a){ var d=a; } return [b, d, c]; }")
+
+
+class TestScopes(unittest.TestCase):
+
+    def test_globals_are_kept(self):
+        self.assertEqual(reduce("var total = 1; function add(value) { return total + value; }"),
+                         "var total = 1; function add(a) { return total + a; }")
+
+    def test_object_keys_and_shorthands(self):
+        self.assertEqual(reduce("function f(data) { return [{data: data}, {data}, data.data]; }"),
+                         "function f(a) { return [{data: a}, {data:a}, a.data]; }")
+
+    def test_sibling_scopes_reuse_names(self):
+        self.assertEqual(reduce("function f(first) { return first; } function g(second) { return second; }"),
+                         "function f(a) { return a; } function g(a) { return a; }")
+
+    def test_shadowed_outer_name(self):
+        # the inner name can not hide the outer one it uses
+        self.assertEqual(reduce("function f(outer) { return function (inner) { return outer + inner; }; }"),
+                         "function f(a) { return function (b) { return a + b; }; }")
+
+    def test_eval_is_not_reduced(self):
+        text = "function f(value) { return eval('value'); }"
+        self.assertEqual(reduce(text), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
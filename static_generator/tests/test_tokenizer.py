@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+
+#
+#   This file is part of JSEncoder.
+#
+# Copyright (c) 2022-2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+import unittest
+
+from static_generator.JSEncoder.Tokenizer import TokenType, tokenize_js
+
+
+def get_tokens(text):
+    return [(token.type, token.value) for token in tokenize_js(text) if token.is_significant()]
+
+
+def get_regexes(text):
+    return [token.value for token in tokenize_js(text) if token.type == TokenType._regex]
+
+
+class TestTokenizer(unittest.TestCase):
+
+    def test_join(self):
+        text = "const a = `x${b + `y${c}`}z`; // comment\n/* block */ d = /re[/]g/i.test(e) / 2;"
+        self.assertEqual("".join(token.value for token in tokenize_js(text)), text)
+
+    def test_postfix_increment_division(self):
+        text = "x = a++ / 2; y = b / 3;"
+        self.assertEqual(get_regexes(text), [])
+        self.assertIn((TokenType._identifier, "y"), get_tokens(text))
+        self.assertIn((TokenType._identifier, "b"), get_tokens(text))
+
+    def test_postfix_decrement_division(self):
+        self.assertEqual(get_regexes("x = a-- / 2; y = b / 3;"), [])
+
+    def test_binary_plus_after_postfix_regex(self):
+        # a++ + /x/
+        self.assertEqual(get_regexes("c = a+++/x/.source.length"), ["/x/"])
+
+    def test_binary_plus_regex(self):
+        self.assertEqual(get_regexes("c = a + /x/g.source"), ["/x/g"])
+        self.assertEqual(get_regexes("c = a+ +/x/.source.length"), ["/x/"])
+
+    def test_division_after_operand(self):
+        self.assertEqual(get_regexes("a = b / c / d; e = (f) / g / h; i = j[0] / k / l; m = 1 / n / 2;"), [])
+
+    def test_regex_after_keyword(self):
+        self.assertEqual(get_regexes("function f(a) { return /a/.test(a) }"), ["/a/"])
+        self.assertEqual(get_regexes("x = typeof /a/"), ["/a/"])
+
+    def test_regex_after_punctuator(self):
+        self.assertEqual(get_regexes("a = /b/; c(/d/, [/e/]); f = g ? /h/ : !/i/"), ["/b/", "/d/", "/e/", "/h/", "/i/"])
+
+    def test_division_after_identifier_keyword_like(self):
+        # "this" and the names end an expression
+        self.assertEqual(get_regexes("a = this.b / 2 / c; d = e.return / 2 / f;"), [])
+
+    def test_template_expression(self):
+        tokens = get_tokens("`a${b / 2}c${d}`")
+        self.assertEqual(tokens[0], (TokenType._template, "`a${"))
+        self.assertIn((TokenType._template, "}c${"), tokens)
+        self.assertEqual(tokens[-1], (TokenType._template, "}`"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+
+#
+#   This file is part of static_generator.
+#
+# Copyright (c) 2022-2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import static_generator.main as main
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class TestRebuild(unittest.TestCase):
+    """
+        The rebuilds of the watch mode (see `__rebuild_changes`).
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.static_dir = os.path.join(self.directory.name, "static")
+        self.templates_dir = os.path.join(self.directory.name, "templates")
+        self.generation_dir = os.path.join(self.static_dir, "gen")
+
+        for directory in (self.static_dir, self.templates_dir, self.generation_dir):
+            os.makedirs(directory)
+
+        self.comp_path = os.path.join(self.static_dir, "app.min.js.comp")
+        write(os.path.join(self.static_dir, "first.js"), "function first(){ return 1; }\n")
+        write(self.comp_path, "includeJS:STATIC_PATH/first.js\n")
+
+        states = []
+
+        with mock.patch.object(main, "__watch", states.append), contextlib.redirect_stdout(io.StringIO()):
+            main.run(self.static_dir, self.templates_dir, self.generation_dir, "map.json",
+                     self.static_dir + "/", ["/gen/"], verbose=False, watch=True)
+
+        self.state = states[0]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def rebuild(self, changed_paths):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            getattr(main, "__rebuild_changes")(self.state, changed_paths)
+
+        return output.getvalue()
+
+    def read_bundle(self):
+        with open(self.state.outputs[self.comp_path][1][0], "r") as f:
+            return f.read()
+
+    def test_include_created_after_a_failed_rebuild(self):
+        new_path = os.path.join(self.static_dir, "new.js")
+        write(self.comp_path, "includeJS:STATIC_PATH/first.js\nincludeJS:STATIC_PATH/new.js\n")
+
+        self.assertIn("[Error] rebuild failed", self.rebuild({self.comp_path}))
+        self.assertEqual(self.state.failed_paths, {self.comp_path})
+        self.assertTrue(getattr(main, "__is_watched")(self.state, new_path))
+
+        write(new_path, "function created(){ return 2; }\n")
+
+        self.assertIn("[Rebuilt] 2 changed file(s)", self.rebuild({new_path}))
+        self.assertEqual(self.state.failed_paths, set())
+        self.assertIn("created", self.read_bundle())
+
+    def test_map_written_after_a_failed_rebuild(self):
+        write(os.path.join(self.templates_dir, "index.comp.html"), "{{app_min_js.static}}")
+        self.rebuild({os.path.join(self.templates_dir, "index.comp.html")})
+
+        write(os.path.join(self.static_dir, "first.js"), "function first(){ return 3; }\n")
+
+        with mock.patch.object(main, "__write_static_file", side_effect=OSError("disk full")):
+            self.assertIn("[Error] rebuild failed", self.rebuild({os.path.join(self.static_dir, "first.js")}))
+
+        self.rebuild(set())
+
+        with open(os.path.join(self.generation_dir, "index.html"), "r") as f:
+            self.assertEqual(f.read(), self.state.map_dict["app_min_js"]["static"])
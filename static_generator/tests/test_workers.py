@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+
+#
+#   This file is part of static_generator.
+#
+# Copyright (c) 2022-2025 Rafael Senties Martinelli.
+#
+# Licensed under the Privative-Friendly Source-Shared License (PFSSL) v1.0.
+# You may use, modify, and distribute this file under the terms of that license.
+#
+# This software is provided "as is", without warranty of any kind.
+# The authors are not liable for any damages arising from its use.
+#
+# See the LICENSE file for more details.
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import static_generator.main as main
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class TestWorkers(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.static_dir = os.path.join(self.directory.name, "static")
+        self.templates_dir = os.path.join(self.directory.name, "templates")
+        self.generation_dir = os.path.join(self.static_dir, "gen")
+
+        for directory in (self.static_dir, self.templates_dir, self.generation_dir):
+            os.makedirs(directory)
+
+        # without semicolons, jsmin keeps the lines
+        for name in ("first", "second", "third"):
+            write(os.path.join(self.static_dir, name + ".js"), f"var {name} = 1\nvar {name}_copy = {name}\n")
+            write(os.path.join(self.static_dir, name + ".min.js.comp"), f"includeJS:STATIC_PATH/{name}.js\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def build(self, workers):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            main.run(self.static_dir, self.templates_dir, self.generation_dir, "map.json",
+                     self.static_dir + "/", ["/gen/"], verbose=False, workers=workers)
+
+        return [line for line in output.getvalue().splitlines() if line.startswith(("[Info]", "\t"))]
+
+    def test_messages_in_order(self):
+        messages = self.build(1)
+
+        self.assertEqual([line for line in messages if line.startswith("[Info]")],
+                         [f"[Info] multiple lines compressing {os.path.join(self.static_dir, name + '.js')}"
+                          for name in ("first", "second", "third")])
+        self.assertEqual(self.build(3), messages)